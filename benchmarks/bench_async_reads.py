@@ -0,0 +1,186 @@
+"""
+Compare the async read endpoints against the previous sync (threadpool + psycopg2)
+handlers at the same concurrency.
+
+Both apps run in-process under uvicorn against the same database; each is driven
+with a fixed number of concurrent clients and we report requests/sec and latency
+percentiles per route.
+
+Only the data-access layer differs: both sides page /songs and /artists the same way,
+and the async app's response caches and /charts snapshots are bypassed (unless
+--with-caches) so that both run the same chart join. Responses are not compressed.
+
+    python -m benchmarks.bench_async_reads --date 2024-09-11 --concurrency 64 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+import httpx
+import psycopg2.extras
+import uvicorn
+from fastapi import FastAPI, HTTPException
+
+from benchmarks.timing import percentile
+import crud.handler
+from crud import async_db
+from crud.cache import ResponseCache
+from crud.db import get_db_connection
+from crud.handler import app as async_app, build_charts_payload, build_available_dates, DEFAULT_PAGE_SIZE
+
+
+# Baseline: the read handlers as they were before the async data-access layer
+sync_app = FastAPI()
+
+
+# Same keyset paging as the async handlers, so both sides return the same rows
+@sync_app.get("/songs", response_model=List[Dict])
+def sync_get_all_songs(after_id: int = 0, limit: int = DEFAULT_PAGE_SIZE):
+    connection = get_db_connection()
+    try:
+        with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            cursor.execute("""
+                SELECT id, title, album, duration, spotify_url, key, genre, language, artist_id
+                FROM songs
+                WHERE id > %s
+                ORDER BY id
+                LIMIT %s;
+            """, (after_id, limit))
+            songs = cursor.fetchall()
+            if not songs:
+                raise HTTPException(status_code=404, detail="No songs found")
+            return songs
+    finally:
+        connection.close()
+
+
+@sync_app.get("/artists")
+def sync_get_all_artists(after_id: int = 0, limit: int = DEFAULT_PAGE_SIZE):
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id, name, type FROM artists WHERE id > %s ORDER BY id LIMIT %s;", (after_id, limit))
+            return [{"id": artist[0], "name": artist[1], "type": artist[2]} for artist in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+@sync_app.get("/charts", response_model=Dict)
+def sync_get_charts(date: str):
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT c.name, ch.position, s.title, a.name, s.album, s.duration, s.spotify_url, s.key, s.genre, s.language, a.type
+                FROM charts ch
+                JOIN countries c ON ch.country_id = c.id
+                JOIN songs s ON ch.song_id = s.id
+                JOIN artists a ON s.artist_id = a.id
+                JOIN song_sources ss ON s.id = ss.song_id
+                JOIN sources src ON ss.source_id = src.id
+                WHERE ch.date = %s AND src.name = 'youtube_RightNow'
+                ORDER BY c.name, ch.position;
+            """, (date,))
+            return build_charts_payload(date, cursor.fetchall())
+    finally:
+        connection.close()
+
+
+@sync_app.get("/charts/available-dates", response_model=Dict)
+def sync_get_available_dates():
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT date FROM chart_dates ORDER BY date;")
+            return build_available_dates(cursor.fetchall())
+    finally:
+        connection.close()
+
+
+def bypass_caches():
+    """Make the async /charts and /charts/available-dates query on every request, like the sync ones."""
+    crud.handler.charts_cache = ResponseCache(0)
+    crud.handler.available_dates_cache = ResponseCache(0)
+
+    async def no_snapshot(date, source="youtube_RightNow"):
+        return None
+
+    async_db.fetch_chart_snapshot = no_snapshot
+
+
+def start_server(app, port):
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def drive(base_url, path, concurrency, total):
+    latencies = []
+    errors = 0
+    remaining = total
+
+    # identity: the sync baseline never compresses, so neither should the async side
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, headers={"Accept-Encoding": "identity"}) as client:
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--date", default="2024-09-11", help="chart date to request from /charts")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per route per app")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--with-caches", action="store_true",
+                        help="keep the async response caches and snapshots (production behaviour, not like-for-like)")
+    args = parser.parse_args()
+
+    if not args.with_caches:
+        bypass_caches()
+
+    routes = [f"/charts?date={args.date}", "/charts/available-dates", "/songs", "/artists"]
+    results = {}
+    for name, app, port in (("sync", sync_app, args.port), ("async", async_app, args.port + 1)):
+        server, thread = start_server(app, port)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            # Warm up pools before measuring
+            asyncio.run(drive(base_url, routes[0], args.concurrency, args.concurrency))
+            results[name] = {route: asyncio.run(drive(base_url, route, args.concurrency, args.requests))
+                             for route in routes}
+        finally:
+            server.should_exit = True
+            thread.join()
+
+    print(json.dumps({"concurrency": args.concurrency, "with_caches": args.with_caches, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
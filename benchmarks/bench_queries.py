@@ -0,0 +1,328 @@
+"""
+EXPLAIN ANALYZE every query issued by the CRUD API, before and after the index migration.
+
+Builds a scratch schema, creates init.sql plus the earlier migrations in it, seeds
+N days x M countries of synthetic top-10 charts, times each query, then applies
+the index migration and times them again. Finally applies the remaining migrations
+and times everything on the current schema ("current"). Queries that need a later
+migration are null in the earlier phases.
+
+Every statement runs inside a savepoint that is rolled back, so the upserts are
+measured without changing the data. The real tables are never touched.
+
+    python -m benchmarks.bench_queries --days 365 --countries 17 --runs 5
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+
+import psycopg2
+
+from benchmarks.synthetic import seed_charts
+from crud.db import connect
+from crud.migrate import MIGRATIONS_DIR
+from crud.stats import CHART_STATS_ROLLUP_SQL
+from crud.store import ARTIST_UPSERT_SQL, SONG_UPSERT_SQL
+
+
+ROOT_DIR = os.path.dirname(MIGRATIONS_DIR)
+INDEX_MIGRATION = "002_lookup_indexes.sql"
+
+# Every query in crud/handler.py (and the modules it delegates to), with psycopg2 placeholders.
+# Parameters are filled in from the seeded data by sample_params().
+QUERIES = {
+    "get_all_songs (page)": """
+        SELECT id, title, album, duration, spotify_url, key, genre, language, artist_id
+        FROM songs WHERE id > %(after_id)s ORDER BY id LIMIT 100;
+    """,
+    "get_song_by_id": """
+        SELECT id, title, album, duration, spotify_url, key, genre, language, artist_id
+        FROM songs WHERE id = %(song_id)s;
+    """,
+    "get_all_artists (page)": "SELECT id, name, type FROM artists WHERE id > %(after_id)s ORDER BY id LIMIT 100;",
+    "get_artist_by_id": "SELECT id, name, type FROM artists WHERE id = %(artist_id)s;",
+    # Re-scraping entries that are already stored; the store's own statements, with named
+    # placeholders for the sample row and the values an unenriched scrape sends
+    "upsert_artist": ARTIST_UPSERT_SQL % ("%(artist_name)s", "'Unknown'"),
+    "upsert_song": SONG_UPSERT_SQL % ("%(title)s", "%(artist_id)s", "'Unknown'", "'00:00:00'", "NULL",
+                                      "'Unknown'", "'Unknown'", "'Unknown'"),
+    "add_country (upsert)": """
+        INSERT INTO countries (name) VALUES (%(country)s)
+        ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+        RETURNING id;
+    """,
+    "add_song_source (source upsert)": """
+        INSERT INTO sources (name) VALUES (%(source)s)
+        ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+        RETURNING id;
+    """,
+    "add_song_source (link)": """
+        INSERT INTO song_sources (song_id, source_id)
+        SELECT %(song_id)s, id FROM sources WHERE name = %(source)s
+        ON CONFLICT (song_id, source_id) DO NOTHING;
+    """,
+    "add_chart_date": "INSERT INTO chart_dates (date) VALUES (%(date)s) ON CONFLICT (date) DO NOTHING;",
+    "add_chart": """
+        INSERT INTO charts (date, country_id, song_id, position)
+        VALUES (%(date)s, 1, %(song_id)s, 1)
+        ON CONFLICT (date, country_id, song_id) DO UPDATE SET position = EXCLUDED.position;
+    """,
+    "charted_dates (republish)": """
+        SELECT DISTINCT ch.date
+        FROM charts ch
+        JOIN songs s ON ch.song_id = s.id
+        WHERE s.id = %(song_id)s OR s.artist_id = %(artist_id)s;
+    """,
+    "get_charts": """
+        SELECT c.name, ch.position, s.title, a.name, s.album, s.duration, s.spotify_url, s.key, s.genre, s.language, a.type
+        FROM charts ch
+        JOIN countries c ON ch.country_id = c.id
+        JOIN songs s ON ch.song_id = s.id
+        JOIN artists a ON s.artist_id = a.id
+        JOIN song_sources ss ON s.id = ss.song_id
+        JOIN sources src ON ss.source_id = src.id
+        WHERE ch.date = %(date)s AND src.name = %(source)s
+        ORDER BY c.name, ch.position;
+    """,
+    "get_charts (snapshot)": "SELECT payload FROM chart_snapshots WHERE date = %(date)s AND source = %(source)s;",
+    "get_charts_range": """
+        SELECT ch.date, c.name, ch.position, s.title, a.name, s.album, s.duration, s.spotify_url, s.key, s.genre, s.language, a.type
+        FROM charts ch
+        JOIN countries c ON ch.country_id = c.id
+        JOIN songs s ON ch.song_id = s.id
+        JOIN artists a ON s.artist_id = a.id
+        JOIN song_sources ss ON s.id = ss.song_id
+        JOIN sources src ON ss.source_id = src.id
+        WHERE ch.date BETWEEN %(range_from)s AND %(date)s
+          AND src.name = %(source)s
+          AND (%(countries)s::varchar[] IS NULL OR c.name = ANY(%(countries)s::varchar[]))
+        ORDER BY ch.date, c.name, ch.position;
+    """,
+    "get_chart_stats (by country)": """
+        SELECT c.name AS grp, st.dimension, st.value, SUM(st.count)::int
+        FROM chart_stats st
+        JOIN sources src ON st.source_id = src.id
+        JOIN countries c ON st.country_id = c.id
+        WHERE st.date BETWEEN %(range_from)s AND %(date)s
+          AND src.name = %(source)s
+          AND (%(country_filter)s::varchar IS NULL OR c.name = %(country_filter)s)
+          AND (%(dimensions)s::varchar[] IS NULL OR st.dimension = ANY(%(dimensions)s::varchar[]))
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 4 DESC;
+    """,
+    "get_song_history": """
+        SELECT ch.date, c.name, ch.position
+        FROM charts ch
+        JOIN countries c ON ch.country_id = c.id
+        WHERE ch.song_id = %(song_id)s
+          AND ch.date BETWEEN COALESCE(%(history_from)s::date, '-infinity') AND COALESCE(%(history_to)s::date, 'infinity')
+          AND (%(country_filter)s::varchar IS NULL OR ch.country_id = (SELECT id FROM countries WHERE name = %(country_filter)s))
+        ORDER BY ch.date, c.name;
+    """,
+    "get_chart_diff": """
+        WITH country_filter AS (
+            SELECT id FROM countries WHERE name = %(country_filter)s
+        ),
+        paired AS (
+            SELECT COALESCE(b.country_id, a.country_id) AS country_id,
+                   COALESCE(b.song_id, a.song_id) AS song_id,
+                   b.position AS previous_position,
+                   a.position AS position,
+                   bool_or(b.song_id IS NOT NULL) OVER w AS charted_before,
+                   bool_or(a.song_id IS NOT NULL) OVER w AS charted_after
+            FROM (SELECT country_id, song_id, position FROM charts
+                  WHERE date = %(previous_date)s AND (%(country_filter)s::varchar IS NULL OR country_id IN (SELECT id FROM country_filter))) b
+            FULL OUTER JOIN
+                 (SELECT country_id, song_id, position FROM charts
+                  WHERE date = %(date)s AND (%(country_filter)s::varchar IS NULL OR country_id IN (SELECT id FROM country_filter))) a
+              ON a.country_id = b.country_id AND a.song_id = b.song_id
+            WINDOW w AS (PARTITION BY COALESCE(b.country_id, a.country_id))
+        )
+        SELECT c.name, p.song_id, s.title, ar.name, p.previous_position, p.position
+        FROM paired p
+        JOIN countries c ON p.country_id = c.id
+        JOIN songs s ON p.song_id = s.id
+        JOIN artists ar ON s.artist_id = ar.id
+        WHERE p.charted_before AND p.charted_after
+          AND p.previous_position IS DISTINCT FROM p.position
+        ORDER BY c.name, p.position NULLS LAST, p.previous_position;
+    """,
+    # pg_trgm.similarity_threshold is set for the session by main(), as search() does per transaction
+    "search (songs)": """
+        SELECT s.id, s.title, s.artist_id, a.name, similarity(s.title_key, normalize_name(%(title)s)) AS score
+        FROM songs s
+        JOIN artists a ON s.artist_id = a.id
+        WHERE s.title_key %% normalize_name(%(title)s)
+        ORDER BY score DESC, s.id
+        LIMIT 20;
+    """,
+    "search (artists)": """
+        SELECT a.id, a.name, a.type, similarity(a.name_key, normalize_name(%(artist_name)s)) AS score
+        FROM artists a
+        WHERE a.name_key %% normalize_name(%(artist_name)s)
+        ORDER BY score DESC, a.id
+        LIMIT 20;
+    """,
+    "get_available_dates": "SELECT date FROM chart_dates ORDER BY date;",
+}
+
+# Range reads (/charts/range, /charts/stats) cover this many days ending at the sample date
+RANGE_DAYS = 7
+SEARCH_MIN_SIMILARITY = 0.3
+
+
+def run_sql_file(cursor, path):
+    with open(path) as f:
+        cursor.execute(f.read())
+
+
+def create_schema(cursor, schema):
+    cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE;")
+    cursor.execute(f"CREATE SCHEMA {schema};")
+    # public too, where pg_trgm lives if it was installed before the benchmark
+    cursor.execute(f"SET search_path TO {schema}, public;")
+    run_sql_file(cursor, os.path.join(ROOT_DIR, "init.sql"))
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        if name.endswith(".sql") and name < INDEX_MIGRATION:
+            run_sql_file(cursor, os.path.join(MIGRATIONS_DIR, name))
+
+
+def apply_migrations(cursor, after):
+    """Apply the migrations that sort after `after`, as crud.migrate would."""
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        if name.endswith(".sql") and name > after:
+            run_sql_file(cursor, os.path.join(MIGRATIONS_DIR, name))
+
+
+def explain(cursor, query, params, runs, required=False):
+    """
+    Median EXPLAIN ANALYZE timings. Each run is rolled back to a savepoint, so writes
+    leave nothing behind. Returns None when the schema lacks something the query needs,
+    unless `required`.
+    """
+    execution, planning = [], []
+    for _ in range(runs):
+        cursor.execute("SAVEPOINT bench_query;")
+        try:
+            cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + query, params)
+            plan = cursor.fetchone()[0][0]
+        except psycopg2.Error:
+            cursor.execute("ROLLBACK TO SAVEPOINT bench_query;")
+            if required:
+                raise
+            return None
+        cursor.execute("ROLLBACK TO SAVEPOINT bench_query;")
+        execution.append(plan["Execution Time"])
+        planning.append(plan["Planning Time"])
+    return {"execution_ms": round(statistics.median(execution), 3),
+            "planning_ms": round(statistics.median(planning), 3)}
+
+
+def time_queries(cursor, params, runs, required=False):
+    return {name: explain(cursor, query, params, runs, required) for name, query in QUERIES.items()}
+
+
+def sample_params(cursor, seeded):
+    """
+    Query parameters for the seeded data. The song is re-read from the charts on the
+    sample date, because migrations/004 merges the duplicate songs rows seed_charts wrote.
+    """
+    date = seeded["date"]
+    cursor.execute("""
+        SELECT s.id, s.title, s.artist_id, a.name
+        FROM charts ch
+        JOIN songs s ON ch.song_id = s.id
+        JOIN artists a ON s.artist_id = a.id
+        WHERE ch.date = %s
+        ORDER BY ch.country_id, ch.position
+        LIMIT 1;
+    """, (date,))
+    song_id, title, artist_id, artist_name = cursor.fetchone()
+    return dict(
+        seeded,
+        song_id=song_id,
+        title=title,
+        artist_id=artist_id,
+        artist_name=artist_name,
+        previous_date=date - datetime.timedelta(days=1),
+        range_from=date - datetime.timedelta(days=RANGE_DAYS - 1),
+        # Optional filters, left unset as in the default requests
+        countries=None,
+        country_filter=None,
+        dimensions=None,
+        history_from=None,
+        history_to=None,
+    )
+
+
+def speedup(before, after):
+    if before is None or after is None:
+        return None
+    return round(before["execution_ms"] / max(after["execution_ms"], 0.001), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--countries", type=int, default=17)
+    parser.add_argument("--songs-per-chart", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=5, help="EXPLAIN ANALYZE runs per query (median reported)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--schema", default="bench_queries")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema afterwards")
+    args = parser.parse_args()
+
+    connection = connect()
+    cursor = connection.cursor()
+    try:
+        create_schema(cursor, args.schema)
+        # The processor used to insert a fresh songs row for every chart entry: mirror that growth
+        seeded = seed_charts(cursor, args.days, args.countries, args.songs_per_chart,
+                             song_pool=max(1, args.days * args.countries // 2), seed=args.seed, song_per_entry=True)
+        connection.commit()
+        params = sample_params(cursor, seeded)
+
+        before = time_queries(cursor, params, args.runs)
+        run_sql_file(cursor, os.path.join(MIGRATIONS_DIR, INDEX_MIGRATION))
+        cursor.execute("ANALYZE;")
+        connection.commit()
+        after = time_queries(cursor, params, args.runs)
+
+        apply_migrations(cursor, INDEX_MIGRATION)
+        # Fill the rollup the way the processor does after each scrape, so /charts/stats has rows
+        for date in seeded["dates"]:
+            cursor.execute(CHART_STATS_ROLLUP_SQL, (date,))
+        cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, false);", (str(SEARCH_MIN_SIMILARITY),))
+        cursor.execute("ANALYZE;")
+        connection.commit()
+        params = sample_params(cursor, seeded)
+        current = time_queries(cursor, params, args.runs, required=True)
+
+        report = {
+            "days": args.days,
+            "countries": args.countries,
+            "songs_per_chart": args.songs_per_chart,
+            "queries": {
+                name: {
+                    "before": before[name],
+                    "after": after[name],
+                    "speedup": speedup(before[name], after[name]),
+                    "current": current[name],
+                }
+                for name in QUERIES
+            },
+        }
+        print(json.dumps(report, indent=2))
+    finally:
+        connection.rollback()
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE;")
+            connection.commit()
+        cursor.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Serialization cost of the /charts payload, per payload size.
+
+Payloads are shaped like pulse-app/src/mocks/fixtures/chartsByDate.js: a date and,
+per country, a top-10 list of songs with songFeatures / artistFeatures. For each
+size it times the encoders on their own, and the full FastAPI response path with
+the default response_model=Dict validation versus FastJSONResponse.
+
+    python -m benchmarks.bench_serialization --countries 1 17 50 200 --iterations 200
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Dict
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from crud.responses import FastJSONResponse
+from crud.serialization import dumps, orjson
+
+
+GENRES = ["Pop", "Hip-Hop", "Latin", "Rock", "R&B", "K-Pop", "Dance"]
+KEYS = ["C Major", "D Major", "F# Minor", "B Minor", "E Minor", "A Major"]
+
+
+def make_payload(countries, songs_per_country=10, seed=7):
+    rng = random.Random(seed)
+    charts = {}
+    for c in range(countries):
+        charts[f"C{c:03d}"] = [
+            {
+                "position": position,
+                "song": f"Song {rng.randrange(10000)}",
+                "artist": f"Artist {rng.randrange(2000)}",
+                "album": f"Album {rng.randrange(3000)}",
+                "duration": f"00:0{rng.randrange(2, 6)}:{rng.randrange(60):02d}",
+                "spotify_url": f"https://open.spotify.com/track/{rng.getrandbits(64):016x}",
+                "songFeatures": {"key": rng.choice(KEYS), "genre": rng.choice(GENRES), "language": "English"},
+                "artistFeatures": {"type": rng.choice(["Solo", "Group"])},
+            }
+            for position in range(1, songs_per_country + 1)
+        ]
+    return {"date": "2024-07-01", "charts": charts}
+
+
+def median_us(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples) * 1e6, 1)
+
+
+def build_app(payload):
+    app = FastAPI()
+
+    @app.get("/validated", response_model=Dict)
+    def validated():
+        return payload
+
+    @app.get("/fast", response_class=FastJSONResponse)
+    def fast():
+        return FastJSONResponse(payload)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--countries", type=int, nargs="+", default=[1, 17, 50, 200])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    results = []
+    for countries in args.countries:
+        payload = make_payload(countries)
+        client = TestClient(build_app(payload))
+        row = {
+            "countries": countries,
+            "bytes": len(dumps(payload)),
+            "stdlib_json_us": median_us(lambda: json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+                                        args.iterations),
+            "fast_dumps_us": median_us(lambda: dumps(payload), args.iterations),
+            "response_model_request_us": median_us(lambda: client.get("/validated"), args.iterations),
+            "fast_response_request_us": median_us(lambda: client.get("/fast"), args.iterations),
+        }
+        results.append(row)
+
+    print(json.dumps({"encoder": "orjson" if orjson is not None else "stdlib", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Cold-import time of the two entry points: the API (crud.handler) and the processor
+Lambda (processor.handler), plus the write helpers they share (crud.store).
+
+Each module is imported in a fresh interpreter under `python -X importtime`, several
+times; we report the median cumulative import time, the modules with the largest self
+time, and whether the web stack (FastAPI, pydantic, uvicorn, boto3) was loaded at all.
+
+    python -m benchmarks.bench_startup --runs 5 --top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ["crud.handler", "processor.handler", "crud.store"]
+HEAVY_PACKAGES = ["fastapi", "pydantic", "starlette", "uvicorn", "asyncpg", "boto3", "botocore", "spotipy"]
+
+
+def import_profile(module):
+    """{imported module: (self us, cumulative us)} for one cold import of `module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+def measure(module, runs, top):
+    profiles = [import_profile(module) for _ in range(runs)]
+    names = set.intersection(*(set(profile) for profile in profiles))
+    self_ms = {name: statistics.median(profile[name][0] for profile in profiles) / 1000 for name in names}
+    heaviest = sorted(self_ms.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "import_ms": round(statistics.median(profile[module][1] for profile in profiles) / 1000, 1),
+        "modules_imported": len(names),
+        "heavy_packages_loaded": [package for package in HEAVY_PACKAGES if package in names],
+        "top_self_ms": {name: round(ms, 1) for name, ms in heaviest},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="cold imports per entry point (median reported)")
+    parser.add_argument("--top", type=int, default=10, help="modules with the largest self time to list")
+    parser.add_argument("--module", action="append", help="entry points to measure (default: API, processor, crud.store)")
+    args = parser.parse_args()
+
+    report = {module: measure(module, args.runs, args.top) for module in args.module or ENTRY_POINTS}
+    print(json.dumps({"python": sys.version.split()[0], "runs": args.runs, "entry_points": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Reproducible load test of the CRUD API against a dedicated, synthetically seeded database.
+
+Recreates the database `--database` (never the real one), builds init.sql plus every
+migration in it, seeds `--days` x `--countries` charts from benchmarks.synthetic with a
+fixed seed, backfills snapshots and stats, then starts the API under uvicorn in a
+subprocess and drives a fixed mix of reads and writes at fixed concurrency for
+`--duration` seconds. Throughput and p50/p95/p99 latency per route are printed as JSON.
+
+    python -m benchmarks.load_test --days 90 --countries 17 --concurrency 32 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+import psycopg2
+
+from benchmarks.synthetic import seed_charts
+from benchmarks.timing import percentile
+from crud.db import DB_SETTINGS
+from crud.migrate import MIGRATIONS_DIR
+
+
+ROOT_DIR = os.path.dirname(MIGRATIONS_DIR)
+
+# (route label, weight); the label is also the key in the report
+TRAFFIC_MIX = [
+    ("GET /charts", 40),
+    ("GET /charts/available-dates", 15),
+    ("GET /songs/{song_id}", 20),
+    ("GET /artists", 15),
+    ("POST /songs", 10),
+]
+
+
+def create_database(name):
+    maintenance = psycopg2.connect(**{**DB_SETTINGS, "dbname": "postgres"})
+    maintenance.autocommit = True
+    try:
+        with maintenance.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{name}";')
+            cursor.execute(f'CREATE DATABASE "{name}";')
+    finally:
+        maintenance.close()
+
+
+def drop_database(name):
+    maintenance = psycopg2.connect(**{**DB_SETTINGS, "dbname": "postgres"})
+    maintenance.autocommit = True
+    try:
+        with maintenance.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{name}";')
+    finally:
+        maintenance.close()
+
+
+def run_module(module, env, *args):
+    subprocess.run([sys.executable, "-m", module, *args], cwd=ROOT_DIR, env=env, check=True)
+
+
+def prepare_database(args, env):
+    """Fresh schema + deterministic data; returns the seeded sample values."""
+    create_database(args.database)
+    connection = psycopg2.connect(**{**DB_SETTINGS, "dbname": args.database})
+    try:
+        with connection.cursor() as cursor:
+            with open(os.path.join(ROOT_DIR, "init.sql")) as f:
+                cursor.execute(f.read())
+        connection.commit()
+        run_module("crud.migrate", env)
+        with connection.cursor() as cursor:
+            params = seed_charts(cursor, args.days, args.countries, args.songs_per_chart, args.song_pool, args.seed)
+        connection.commit()
+    finally:
+        connection.close()
+
+    run_module("crud.snapshots", env)
+    run_module("crud.stats", env)
+    return params
+
+
+def start_api(port, env):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "crud.handler:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT_DIR, env=env
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API exited with code {process.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/db/pool", timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API did not start within 30 seconds")
+
+
+def build_request(route, rng, params, sequence):
+    """(method, path, json body) for one request of the given route."""
+    if route == "GET /charts":
+        return "GET", f"/charts?date={rng.choice(params['dates'])}", None
+    if route == "GET /charts/available-dates":
+        return "GET", "/charts/available-dates", None
+    if route == "GET /songs/{song_id}":
+        return "GET", f"/songs/{rng.randint(1, params['song_count'])}", None
+    if route == "GET /artists":
+        return "GET", f"/artists?after_id={rng.randrange(params['artist_count'])}", None
+    # Fresh titles so every write is an insert, not a no-op upsert
+    return "POST", "/songs", {"title": f"Load Test Song {sequence}",
+                              "artist_id": rng.randint(1, params["artist_count"]),
+                              "album": "Load Test", "duration": "00:03:00"}
+
+
+async def drive(base_url, params, concurrency, duration, seed):
+    routes = [route for route, _ in TRAFFIC_MIX]
+    weights = [weight for _, weight in TRAFFIC_MIX]
+    latencies = {route: [] for route in routes}
+    errors = {route: 0 for route in routes}
+    sequence = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        async def worker(worker_id, stop_at):
+            nonlocal sequence
+            # One generator per worker keeps the request sequence independent of scheduling
+            rng = random.Random(seed * 1000 + worker_id)
+            while time.perf_counter() < stop_at:
+                route = rng.choices(routes, weights)[0]
+                sequence += 1
+                method, path, body = build_request(route, rng, params, f"{seed}-{worker_id}-{sequence}")
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                latencies[route].append(time.perf_counter() - start)
+                if failed:
+                    errors[route] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i, started + duration) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    report = {}
+    for route in routes:
+        samples = latencies[route]
+        if not samples:
+            continue
+        report[route] = {
+            "requests": len(samples),
+            "errors": errors[route],
+            "rps": round(len(samples) / elapsed, 1),
+            "p50_ms": round(percentile(samples, 50) * 1000, 2),
+            "p95_ms": round(percentile(samples, 95) * 1000, 2),
+            "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        }
+    total = sum(len(samples) for samples in latencies.values())
+    return {"elapsed_s": round(elapsed, 2), "requests": total, "errors": sum(errors.values()),
+            "rps": round(total / elapsed, 1), "routes": report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--countries", type=int, default=17)
+    parser.add_argument("--songs-per-chart", type=int, default=10)
+    parser.add_argument("--song-pool", type=int, default=None, help="distinct songs (default 5x one day of charts)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of measured traffic")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of unmeasured traffic first")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--database", default="music_db_loadtest", help="scratch database, dropped and recreated")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database afterwards")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.database == DB_SETTINGS["dbname"]:
+        parser.error("--database must not be the application database")
+
+    env = {**os.environ, "POSTGRES_DB": args.database}
+    params = prepare_database(args, env)
+    process = start_api(args.port, env)
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        if args.warmup > 0:
+            asyncio.run(drive(base_url, params, args.concurrency, args.warmup, args.seed + 1))
+        result = asyncio.run(drive(base_url, params, args.concurrency, args.duration, args.seed))
+    finally:
+        process.terminate()
+        process.wait()
+        if not args.keep:
+            drop_database(args.database)
+
+    report = {
+        "days": args.days,
+        "countries": args.countries,
+        "songs_per_chart": args.songs_per_chart,
+        "song_pool": params["song_count"],
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "seed": args.seed,
+        "mix": dict(TRAFFIC_MIX),
+        **result,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Deterministic synthetic chart data for the benchmarks and the load test.
+
+Seeds `days` dates x `countries` countries of top-N charts drawn from a fixed pool of
+songs and artists, into whatever schema the cursor's search_path points at.
+"""
+import datetime
+import random
+
+import psycopg2.extras
+
+
+SOURCES = ["youtube_RightNow", "youtube_Hot100", "billboard_Hot100"]
+GENRES = ["pop", "rock", "hip hop", "latin", "k-pop", "edm", "reggaeton", None]
+LANGUAGES = ["English", "Spanish", "Korean", "Portuguese", "Unknown"]
+ARTIST_TYPES = ["Person", "Group", "Unknown"]
+START_DATE = datetime.date(2024, 1, 1)
+
+
+def seed_charts(cursor, days, countries, songs_per_chart=10, song_pool=None, seed=42, song_per_entry=False):
+    """
+    Insert chart_dates, countries, sources, artists, songs, song_sources and charts.
+
+    Every (title, artist) pair is unique and no song repeats within one chart, so the
+    data satisfies every constraint added by the migrations. Returns sample values for
+    parameterizing queries against the seeded data.
+
+    With song_per_entry, every chart entry gets its own songs row, titles drawn from
+    the pool, the way the processor wrote them before the natural keys of
+    migrations/004. Only for schemas older than that migration, which merges them.
+    """
+    rng = random.Random(seed)
+    dates = [START_DATE + datetime.timedelta(days=i) for i in range(days)]
+    country_names = [f"C{i:03d}" for i in range(countries)]
+    song_pool = max(song_pool or songs_per_chart * countries * 5, songs_per_chart)
+    artist_count = max(10, song_pool // 4)
+
+    psycopg2.extras.execute_values(cursor, "INSERT INTO chart_dates (date) VALUES %s", [(d,) for d in dates])
+    psycopg2.extras.execute_values(cursor, "INSERT INTO countries (name) VALUES %s", [(c,) for c in country_names])
+    psycopg2.extras.execute_values(cursor, "INSERT INTO sources (name) VALUES %s", [(s,) for s in SOURCES])
+
+    # Partitioned charts (migrations/005) need their month partitions before the insert
+    cursor.execute("SELECT to_regproc('ensure_chart_partition') IS NOT NULL;")
+    if cursor.fetchone()[0]:
+        for month in sorted({d.replace(day=1) for d in dates}):
+            cursor.execute("SELECT ensure_chart_partition(%s);", (month,))
+
+    psycopg2.extras.execute_values(
+        cursor, "INSERT INTO artists (name, type) VALUES %s",
+        [(f"Artist {i}", rng.choice(ARTIST_TYPES)) for i in range(artist_count)], page_size=1000
+    )
+    def song_row(i):
+        return (f"Song {i}", i % artist_count + 1, f"Album {i // 10}", f"00:0{rng.randrange(2, 6)}:{rng.randrange(60):02d}",
+                f"https://open.spotify.com/track/{i:022d}", str(rng.randrange(12)), rng.choice(GENRES), rng.choice(LANGUAGES))
+
+    entries = [(date, country_id, position) for date in dates for country_id in range(1, countries + 1)
+               for position in range(1, songs_per_chart + 1)]
+    if song_per_entry:
+        song_rows = [song_row(rng.randrange(song_pool)) for _ in entries]
+    else:
+        song_rows = [song_row(i) for i in range(song_pool)]
+    song_count = len(song_rows)
+    psycopg2.extras.execute_values(
+        cursor,
+        "INSERT INTO songs (title, artist_id, album, duration, spotify_url, key, genre, language) VALUES %s",
+        song_rows, page_size=5000
+    )
+    # Every song is at least on youtube_RightNow, the source /charts defaults to
+    source_rows = [(i, 1) for i in range(1, song_count + 1)]
+    source_rows += [(i, rng.randrange(2, len(SOURCES) + 1)) for i in range(1, song_count + 1) if rng.random() < 0.3]
+    psycopg2.extras.execute_values(
+        cursor, "INSERT INTO song_sources (song_id, source_id) VALUES %s ON CONFLICT DO NOTHING",
+        source_rows, page_size=5000
+    )
+
+    if song_per_entry:
+        chart_rows = [(date, country_id, song_id, position)
+                      for song_id, (date, country_id, position) in enumerate(entries, start=1)]
+    else:
+        chart_rows = []
+        for date in dates:
+            for country_id in range(1, countries + 1):
+                for position, song_id in enumerate(rng.sample(range(1, song_pool + 1), songs_per_chart), start=1):
+                    chart_rows.append((date, country_id, song_id, position))
+    psycopg2.extras.execute_values(
+        cursor, "INSERT INTO charts (date, country_id, song_id, position) VALUES %s", chart_rows, page_size=5000
+    )
+    cursor.execute("ANALYZE;")
+
+    sample = song_count // 2
+    title, artist_id = song_rows[sample][:2]
+    return {
+        "dates": [d.isoformat() for d in dates],
+        "date": dates[len(dates) // 2],
+        "source": SOURCES[0],
+        "country": country_names[-1],
+        "song_count": song_count,
+        "artist_count": artist_count,
+        "song_id": sample + 1,
+        "artist_id": artist_id,
+        "artist_name": f"Artist {artist_id - 1}",
+        "title": title,
+        "after_id": song_count // 2,
+    }
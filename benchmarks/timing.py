@@ -0,0 +1,8 @@
+"""Latency summaries shared by the HTTP benchmarks."""
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile (0-100) of a non-empty sequence."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
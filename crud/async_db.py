@@ -0,0 +1,292 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+import os
+import time
+import asyncpg
+from crud.db import (DB_SETTINGS,
+                     DB_POOL_MIN_SIZE,
+                     DB_POOL_MAX_SIZE,
+                     DB_POOL_ACQUIRE_TIMEOUT,
+                     PoolTimeout)
+from crud.metrics import observe_db
+
+
+# asyncio-native data access for the FastAPI read endpoints.
+# The sync write helpers in crud.store stay on psycopg2 for the processor.
+
+# Rows fetched per round-trip when streaming through a server-side cursor
+STREAM_PREFETCH = int(os.getenv("STREAM_PREFETCH", "500"))
+
+_pool = None
+_pool_lock = None
+
+
+async def get_async_pool():
+    """Return the process-wide asyncpg pool, creating it on first use."""
+    global _pool, _pool_lock
+    if _pool is None:
+        if _pool_lock is None:
+            # Created lazily so it binds to the running event loop
+            _pool_lock = asyncio.Lock()
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await asyncpg.create_pool(
+                    database=DB_SETTINGS["dbname"],
+                    user=DB_SETTINGS["user"],
+                    password=DB_SETTINGS["password"],
+                    host=DB_SETTINGS["host"],
+                    port=int(DB_SETTINGS["port"]),
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                )
+                logging.info("Async database pool established")
+    return _pool
+
+
+async def close_async_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def async_pool_stats():
+    if _pool is None:
+        return {"size": 0, "idle": 0, "max_size": DB_POOL_MAX_SIZE}
+    return {"size": _pool.get_size(), "idle": _pool.get_idle_size(), "max_size": DB_POOL_MAX_SIZE}
+
+
+@contextlib.asynccontextmanager
+async def acquire():
+    """Borrow a pooled connection, surfacing an exhausted pool as PoolTimeout."""
+    pool = await get_async_pool()
+    start = time.perf_counter()
+    try:
+        connection = await pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT)
+        observe_db("asyncpg", "acquire", time.perf_counter() - start)
+    except asyncio.TimeoutError:
+        raise PoolTimeout(f"Timed out after {DB_POOL_ACQUIRE_TIMEOUT}s waiting for a database connection")
+    try:
+        yield connection
+    finally:
+        await pool.release(connection)
+
+
+async def timed_fetch(connection, query, *args):
+    """connection.fetch, recorded for /metrics. asyncpg executes and fetches in one round-trip."""
+    start = time.perf_counter()
+    try:
+        return await connection.fetch(query, *args)
+    finally:
+        observe_db("asyncpg", "execute", time.perf_counter() - start, sql=query, params=args)
+
+
+async def fetch(query, *args):
+    """Run a query on a pooled connection and return all rows."""
+    async with acquire() as connection:
+        return await timed_fetch(connection, query, *args)
+
+
+async def stream(query, *args, prefetch=STREAM_PREFETCH):
+    """
+    Yield rows one by one from a server-side cursor.
+
+    Only `prefetch` rows are held in memory at a time, however large the result is.
+    The pooled connection is held until the generator is exhausted or closed.
+    """
+    async with acquire() as connection:
+        # Cursors only live inside a transaction
+        async with connection.transaction():
+            async for row in connection.cursor(query, *args, prefetch=prefetch):
+                yield row
+
+
+SONGS_PAGE_QUERY = """
+    SELECT id, title, album, duration, spotify_url, key, genre, language, artist_id
+    FROM songs
+    WHERE id > $1
+    ORDER BY id
+    LIMIT $2;
+"""
+
+ARTISTS_PAGE_QUERY = """
+    SELECT id, name, type
+    FROM artists
+    WHERE id > $1
+    ORDER BY id
+    LIMIT $2;
+"""
+
+
+async def fetch_songs(after_id=0, limit=None):
+    """One keyset page of songs with id > after_id; limit=None means no limit."""
+    return await fetch(SONGS_PAGE_QUERY, after_id, limit)
+
+
+def stream_songs(after_id=0, limit=None):
+    return stream(SONGS_PAGE_QUERY, after_id, limit)
+
+
+async def fetch_artists(after_id=0, limit=None):
+    """One keyset page of artists with id > after_id; limit=None means no limit."""
+    return await fetch(ARTISTS_PAGE_QUERY, after_id, limit)
+
+
+def stream_artists(after_id=0, limit=None):
+    return stream(ARTISTS_PAGE_QUERY, after_id, limit)
+
+
+async def fetch_available_dates():
+    return await fetch("SELECT date FROM chart_dates ORDER BY date;")
+
+
+async def fetch_chart_snapshot(date, source="youtube_RightNow"):
+    """Pre-serialized /charts body for a date and source, or None if no snapshot exists."""
+    rows = await fetch(
+        "SELECT payload FROM chart_snapshots WHERE date = $1 AND source = $2;",
+        datetime.date.fromisoformat(date), source
+    )
+    return rows[0][0].encode("utf-8") if rows else None
+
+
+async def fetch_charts(date, source="youtube_RightNow"):
+    """Chart rows for one date and source, in the column order expected by build_charts_payload."""
+    return await fetch("""
+        SELECT c.name, ch.position, s.title, a.name, s.album, s.duration, s.spotify_url, s.key, s.genre, s.language, a.type
+        FROM charts ch
+        JOIN countries c ON ch.country_id = c.id
+        JOIN songs s ON ch.song_id = s.id
+        JOIN artists a ON s.artist_id = a.id
+        JOIN song_sources ss ON s.id = ss.song_id
+        JOIN sources src ON ss.source_id = src.id
+        WHERE ch.date = $1 AND src.name = $2
+        ORDER BY c.name, ch.position;
+    """, datetime.date.fromisoformat(date), source)
+
+
+def stream_charts_range(date_from, date_to, source="youtube_RightNow", countries=None):
+    """Chart rows for every date in [date_from, date_to], ordered by date, then as fetch_charts."""
+    return stream("""
+        SELECT ch.date, c.name, ch.position, s.title, a.name, s.album, s.duration, s.spotify_url, s.key, s.genre, s.language, a.type
+        FROM charts ch
+        JOIN countries c ON ch.country_id = c.id
+        JOIN songs s ON ch.song_id = s.id
+        JOIN artists a ON s.artist_id = a.id
+        JOIN song_sources ss ON s.id = ss.song_id
+        JOIN sources src ON ss.source_id = src.id
+        WHERE ch.date BETWEEN $1 AND $2
+          AND src.name = $3
+          AND ($4::varchar[] IS NULL OR c.name = ANY($4::varchar[]))
+        ORDER BY ch.date, c.name, ch.position;
+    """, datetime.date.fromisoformat(date_from), datetime.date.fromisoformat(date_to), source, countries)
+
+
+# Grouping expressions allowed for fetch_chart_stats
+STATS_GROUPINGS = {
+    "total": "'total'",
+    "date": "st.date::text",
+    "country": "c.name",
+}
+
+
+async def fetch_chart_stats(date_from, date_to, source="youtube_RightNow", country=None, dimensions=None, by="total"):
+    """(group, dimension, value, count) rows aggregated from the chart_stats rollup."""
+    group = STATS_GROUPINGS[by]
+    return await fetch(f"""
+        SELECT {group} AS grp, st.dimension, st.value, SUM(st.count)::int
+        FROM chart_stats st
+        JOIN sources src ON st.source_id = src.id
+        JOIN countries c ON st.country_id = c.id
+        WHERE st.date BETWEEN $1 AND $2
+          AND src.name = $3
+          AND ($4::varchar IS NULL OR c.name = $4)
+          AND ($5::varchar[] IS NULL OR st.dimension = ANY($5::varchar[]))
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 4 DESC;
+    """, datetime.date.fromisoformat(date_from), datetime.date.fromisoformat(date_to), source, country, dimensions)
+
+
+async def fetch_song_history(song_id, date_from=None, date_to=None, country=None):
+    """(date, country, position) rows for one song, read from idx_charts_song_history."""
+    return await fetch("""
+        SELECT ch.date, c.name, ch.position
+        FROM charts ch
+        JOIN countries c ON ch.country_id = c.id
+        WHERE ch.song_id = $1
+          AND ch.date BETWEEN COALESCE($2::date, '-infinity') AND COALESCE($3::date, 'infinity')
+          AND ($4::varchar IS NULL OR ch.country_id = (SELECT id FROM countries WHERE name = $4))
+        ORDER BY ch.date, c.name;
+    """, song_id,
+        datetime.date.fromisoformat(date_from) if date_from else None,
+        datetime.date.fromisoformat(date_to) if date_to else None,
+        country)
+
+
+async def fetch_chart_diff(date_from, date_to, country=None):
+    """
+    Entries that differ between two chart dates: (country, song_id, title, artist,
+    previous position, position), with NULL on the side the song is absent from.
+
+    One full outer join of the two dates; unchanged entries are filtered out in SQL, so
+    only changes cross the wire. Countries without a chart on both dates are skipped,
+    otherwise a missing scrape would report the whole chart as dropped.
+    """
+    return await fetch("""
+        WITH country_filter AS (
+            SELECT id FROM countries WHERE name = $3
+        ),
+        paired AS (
+            SELECT COALESCE(b.country_id, a.country_id) AS country_id,
+                   COALESCE(b.song_id, a.song_id) AS song_id,
+                   b.position AS previous_position,
+                   a.position AS position,
+                   bool_or(b.song_id IS NOT NULL) OVER w AS charted_before,
+                   bool_or(a.song_id IS NOT NULL) OVER w AS charted_after
+            FROM (SELECT country_id, song_id, position FROM charts
+                  WHERE date = $1 AND ($3::varchar IS NULL OR country_id IN (SELECT id FROM country_filter))) b
+            FULL OUTER JOIN
+                 (SELECT country_id, song_id, position FROM charts
+                  WHERE date = $2 AND ($3::varchar IS NULL OR country_id IN (SELECT id FROM country_filter))) a
+              ON a.country_id = b.country_id AND a.song_id = b.song_id
+            WINDOW w AS (PARTITION BY COALESCE(b.country_id, a.country_id))
+        )
+        SELECT c.name, p.song_id, s.title, ar.name, p.previous_position, p.position
+        FROM paired p
+        JOIN countries c ON p.country_id = c.id
+        JOIN songs s ON p.song_id = s.id
+        JOIN artists ar ON s.artist_id = ar.id
+        WHERE p.charted_before AND p.charted_after
+          AND p.previous_position IS DISTINCT FROM p.position
+        ORDER BY c.name, p.position NULLS LAST, p.previous_position;
+    """, datetime.date.fromisoformat(date_from), datetime.date.fromisoformat(date_to), country)
+
+
+async def song_exists(song_id):
+    return bool(await fetch("SELECT 1 FROM songs WHERE id = $1;", song_id))
+
+
+async def search(q, limit, min_similarity):
+    """Songs and artists whose normalized title / name is trigram-similar to q, best first."""
+    async with acquire() as connection:
+        async with connection.transaction():
+            # The % operator (which can use the GIN indexes) compares against this threshold
+            await connection.execute("SELECT set_config('pg_trgm.similarity_threshold', $1, true);",
+                                     str(min_similarity))
+            songs = await timed_fetch(connection, """
+                SELECT s.id, s.title, s.artist_id, a.name, similarity(s.title_key, normalize_name($1)) AS score
+                FROM songs s
+                JOIN artists a ON s.artist_id = a.id
+                WHERE s.title_key % normalize_name($1)
+                ORDER BY score DESC, s.id
+                LIMIT $2;
+            """, q, limit)
+            artists = await timed_fetch(connection, """
+                SELECT a.id, a.name, a.type, similarity(a.name_key, normalize_name($1)) AS score
+                FROM artists a
+                WHERE a.name_key % normalize_name($1)
+                ORDER BY score DESC, a.id
+                LIMIT $2;
+            """, q, limit)
+    return songs, artists
@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+# Chart responses are cached per (date, source). Historical dates never change, but the
+# processor writes from another process, so entries also expire after CHARTS_CACHE_TTL seconds.
+CHARTS_CACHE_MAX_ENTRIES = int(os.getenv("CHARTS_CACHE_MAX_ENTRIES", "256"))
+CHARTS_CACHE_TTL = float(os.getenv("CHARTS_CACHE_TTL", "60"))
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with a size bound, optional TTL and hit/miss counters."""
+
+    def __init__(self, max_entries, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, predicate):
+        """Drop every entry whose key matches predicate(key)."""
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+charts_cache = ResponseCache(CHARTS_CACHE_MAX_ENTRIES, ttl=CHARTS_CACHE_TTL or None)
+# Single entry holding the /charts/available-dates tree
+available_dates_cache = ResponseCache(1, ttl=CHARTS_CACHE_TTL or None)
+
+
+def invalidate_chart_date(date):
+    """Forget cached /charts responses for a date, for every source."""
+    date = str(date)
+    charts_cache.invalidate(lambda key: key[0] == date)
+
+
+def invalidate_available_dates():
+    available_dates_cache.clear()
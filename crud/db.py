@@ -0,0 +1,274 @@
+import os
+import logging
+import threading
+import time
+import psycopg2
+import psycopg2.extensions
+from crud.metrics import InstrumentedCursor, observe_db
+
+
+# Connection settings, overridable from the environment (see serverless.yml / docker-compose.yml)
+DB_SETTINGS = {
+    "dbname": os.getenv("POSTGRES_DB", "music_db"),
+    "user": os.getenv("POSTGRES_USER", "user"),
+    "password": os.getenv("POSTGRES_PASSWORD", "password"),
+    "host": os.getenv("POSTGRES_HOST", "db"),  # Make sure this matches the service name in docker-compose
+    "port": os.getenv("POSTGRES_PORT", "5432"),
+}
+
+# Pool sizing
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+# Idle connections older than this are pinged before being handed out
+DB_POOL_HEALTHCHECK_AFTER = float(os.getenv("DB_POOL_HEALTHCHECK_AFTER", "30"))
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be acquired from the pool in time."""
+
+
+def connect(retries=5, delay=5):
+    """Open a new raw psycopg2 connection, retrying while the database comes up."""
+    for i in range(retries):
+        try:
+            start = time.perf_counter()
+            connection = psycopg2.connect(**DB_SETTINGS)
+            observe_db("psycopg2", "connect", time.perf_counter() - start)
+            logging.info("Database connection established")
+            return connection
+        except Exception as e:
+            logging.error(f"Database connection failed, retrying in {delay} seconds... ({i+1}/{retries})")
+            time.sleep(delay)
+    raise Exception("Database connection failed after multiple attempts")
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of psycopg2 connections.
+
+    Connections are created lazily up to max_size, idle ones are health-checked
+    before reuse, and callers wait up to `timeout` seconds for a free slot.
+    """
+
+    def __init__(self, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE,
+                 timeout=DB_POOL_ACQUIRE_TIMEOUT, healthcheck_after=DB_POOL_HEALTHCHECK_AFTER):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.healthcheck_after = healthcheck_after
+        self._idle = []  # list of (connection, last_used)
+        self._in_use = set()
+        self._waiting = 0
+        self._created = 0
+        self._discarded = 0
+        self._lock = threading.Condition()
+
+        for _ in range(min_size):
+            self._idle.append((self._open(), time.monotonic()))
+
+    def _open(self):
+        connection = connect()
+        with self._lock:
+            self._created += 1
+        return connection
+
+    def _discard(self, connection):
+        self._discarded += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, connection, last_used):
+        if connection.closed:
+            return False
+        if time.monotonic() - last_used < self.healthcheck_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            connection.rollback()
+            return True
+        except Exception as e:
+            logging.warning(f"Discarding unhealthy pooled connection: {e}")
+            return False
+
+    def acquire(self, timeout=None):
+        """Take a connection from the pool, opening a new one if there is room."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            connection = placeholder = None
+            with self._lock:
+                self._waiting += 1
+                try:
+                    while True:
+                        if self._idle:
+                            # Keep the slot reserved while the connection is checked
+                            connection, last_used = self._idle.pop()
+                            self._in_use.add(connection)
+                            break
+
+                        if len(self._in_use) < self.max_size:
+                            # Reserve the slot before connecting so concurrent callers respect max_size
+                            placeholder = object()
+                            self._in_use.add(placeholder)
+                            break
+
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolTimeout(f"Timed out after {timeout}s waiting for a database connection")
+                        self._lock.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            if connection is None:
+                break
+
+            # Health-check outside the lock so a half-open connection does not block other callers
+            if self._is_healthy(connection, last_used):
+                return connection
+            with self._lock:
+                self._in_use.discard(connection)
+                self._discard(connection)
+                self._lock.notify()
+
+        # Open the connection outside the lock so a slow handshake does not block releases
+        try:
+            connection = self._open()
+        except Exception:
+            with self._lock:
+                self._in_use.discard(placeholder)
+                self._lock.notify()
+            raise
+
+        with self._lock:
+            self._in_use.discard(placeholder)
+            self._in_use.add(connection)
+        return connection
+
+    def release(self, connection):
+        """Return a connection to the pool, rolling back any unfinished transaction."""
+        with self._lock:
+            if connection not in self._in_use:
+                return
+
+        # Roll back outside the lock; the connection keeps its slot until it is back in the pool
+        healthy = not connection.closed
+        if healthy:
+            try:
+                if connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+            except Exception as e:
+                logging.warning(f"Failed to reset pooled connection: {e}")
+                healthy = False
+
+        with self._lock:
+            if connection not in self._in_use:
+                return
+            self._in_use.discard(connection)
+            if healthy:
+                self._idle.append((connection, time.monotonic()))
+            elif connection.closed:
+                self._discarded += 1
+            else:
+                self._discard(connection)
+            self._lock.notify()
+
+    def close(self):
+        """Close every idle connection; connections in use are closed on release."""
+        with self._lock:
+            for connection, _ in self._idle:
+                self._discard(connection)
+            self._idle = []
+
+    def stats(self):
+        with self._lock:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "created": self._created,
+                "discarded": self._discarded,
+            }
+
+
+class PooledConnection:
+    """
+    Thin proxy around a pooled psycopg2 connection.
+
+    Behaves like the underlying connection, except that close() hands it back
+    to the pool instead of tearing down the TCP session.
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        return getattr(self._connection, name)
+
+    @property
+    def raw(self):
+        return self._connection
+
+    def cursor(self, *args, **kwargs):
+        # Time execute / fetch round-trips for /metrics and the slow-query log
+        if self._connection is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs))
+
+    def close(self):
+        if self._connection is not None:
+            self._pool.release(self._connection)
+            self._connection = None
+
+    def __del__(self):
+        # Safety net for code paths that forget to close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def get_db_connection(timeout=None):
+    """Borrow a connection from the pool. Call close() on it to give it back."""
+    pool = get_pool()
+    start = time.perf_counter()
+    connection = pool.acquire(timeout=timeout)
+    observe_db("psycopg2", "acquire", time.perf_counter() - start)
+    return PooledConnection(pool, connection)
+
+
+def pool_stats():
+    return get_pool().stats() if _pool is not None else {
+        "min_size": DB_POOL_MIN_SIZE,
+        "max_size": DB_POOL_MAX_SIZE,
+        "in_use": 0,
+        "idle": 0,
+        "waiting": 0,
+        "created": 0,
+        "discarded": 0,
+    }
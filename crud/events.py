@@ -0,0 +1,103 @@
+import asyncio
+import json
+import logging
+import os
+import asyncpg
+from crud.db import DB_SETTINGS
+from crud.cache import invalidate_chart_date, invalidate_available_dates
+from crud.snapshots import CHART_EVENTS_CHANNEL
+
+
+# Events buffered per subscriber; a client that falls further behind loses the oldest ones
+CHART_EVENTS_QUEUE_SIZE = int(os.getenv("CHART_EVENTS_QUEUE_SIZE", "1000"))
+# Seconds between liveness checks of the LISTEN connection, and before reconnecting
+CHART_EVENTS_RECONNECT_DELAY = float(os.getenv("CHART_EVENTS_RECONNECT_DELAY", "5"))
+
+
+class ChartEventBroker:
+    """
+    Fans the "chart updated" notifications published by crud.snapshots out to
+    in-process subscribers (the SSE clients of GET /charts/events).
+
+    One dedicated asyncpg connection LISTENs on CHART_EVENTS_CHANNEL and is
+    re-established if it drops. Each notification also invalidates the cached
+    /charts responses for its date, since it usually comes from the processor.
+    """
+
+    def __init__(self, channel=CHART_EVENTS_CHANNEL, queue_size=CHART_EVENTS_QUEUE_SIZE):
+        self.channel = channel
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._task = None
+        self.received = 0
+        self.dropped = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def stats(self):
+        return {"listening": self._task is not None and not self._task.done(),
+                "subscribers": len(self._subscribers), "received": self.received, "dropped": self.dropped}
+
+    def publish(self, event):
+        self.received += 1
+        invalidate_chart_date(event["date"])
+        # The date may be new to this process; the available-dates tree is one cheap entry
+        invalidate_available_dates()
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            self.publish(json.loads(payload))
+        except (ValueError, KeyError) as e:
+            logging.error(f"Ignoring malformed chart event {payload!r}: {e}")
+
+    async def _listen(self):
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(
+                    database=DB_SETTINGS["dbname"],
+                    user=DB_SETTINGS["user"],
+                    password=DB_SETTINGS["password"],
+                    host=DB_SETTINGS["host"],
+                    port=int(DB_SETTINGS["port"]),
+                )
+                await connection.add_listener(self.channel, self._on_notification)
+                logging.info(f"Listening for chart events on '{self.channel}'")
+                while not connection.is_closed():
+                    await asyncio.sleep(CHART_EVENTS_RECONNECT_DELAY)
+                logging.warning("Chart events connection closed, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Chart events listener failed, retrying in {CHART_EVENTS_RECONNECT_DELAY}s: {e}")
+                await asyncio.sleep(CHART_EVENTS_RECONNECT_DELAY)
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+
+chart_events = ChartEventBroker()
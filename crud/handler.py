@@ -1,13 +1,29 @@
 import psycopg2
-from fastapi import FastAPI, HTTPException ,Query,Path
+from fastapi import FastAPI, HTTPException ,Query,Path, Request, BackgroundTasks
+from fastapi.responses import JSONResponse, StreamingResponse, Response, PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict
 import uvicorn
+import asyncio
 import datetime
 import logging
+import os
 import time
 from fastapi.middleware.cors import CORSMiddleware
+import psycopg2.errors
 import psycopg2.extras
+import asyncpg
+from crud import async_db
+from crud.db import get_db_connection, pool_stats, PoolTimeout
+from crud.metrics import RequestStats, current_request, finish_request, render_metrics
+from crud.cache import charts_cache, available_dates_cache, invalidate_chart_date
+from crud.http_cache import EncodedBody, conditional_response
+from crud.responses import FastJSONResponse
+from crud.serialization import dumps
+from crud.snapshots import build_charts_payload, serialize_payload, rebuild_snapshots
+from crud.stats import STAT_DIMENSIONS, refresh_chart_stats
+from crud.store import StoreError, upsert_artist, upsert_song, charted_dates, add_charts_bulk
+from crud.events import chart_events
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -24,6 +40,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Keyset pagination for /songs and /artists
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Seconds of silence after which /charts/events sends a keep-alive comment
+CHART_EVENTS_HEARTBEAT = float(os.getenv("CHART_EVENTS_HEARTBEAT", "15"))
+
 # Data Models
 class SongFeatures(BaseModel):
     key: Optional[str]
@@ -42,10 +65,11 @@ class SongData(BaseModel):
     spotify_url: Optional[str]
     songFeatures: SongFeatures
     artistFeatures: ArtistFeatures
+    source: Optional[str] = None
 
 class ChartData(BaseModel):
     date: str
-    country: str
+    country: Optional[str] = None
     charts: Dict[str, List[SongData]]
 
 class ArtistData(BaseModel):
@@ -86,44 +110,121 @@ class SongUpdateRequest(BaseModel):
     language: str = None
 
 
-def get_db_connection(retries=5, delay=5):  # Increased retries and delay
-    for i in range(retries):
-        try:
-            connection = psycopg2.connect(
-                dbname="music_db",
-                user="user",
-                password="password",
-                host="db",  # Make sure this matches the service name in docker-compose
-                port="5432"
-            )
-            logging.info("Database connection established")
-            return connection
-        except Exception as e:
-            logging.error(f"Database connection failed, retrying in {delay} seconds... ({i+1}/{retries})")
-            time.sleep(delay)
-    raise Exception("Database connection failed after multiple attempts")
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    """Per-route latency and DB time for /metrics. Streaming bodies are timed up to their headers."""
+    stats = RequestStats()
+    token = current_request.set(stats)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        current_request.reset(token)
+        route = request.scope.get("route")
+        finish_request(stats, request.method, route.path if route else "unmatched", status,
+                       time.perf_counter() - start)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text exposition of request latency, DB round-trips and pool usage."""
+    pool = pool_stats()
+    extra = [
+        "# HELP db_pool_connections Connections in the sync pool by state.",
+        "# TYPE db_pool_connections gauge",
+        f'db_pool_connections{{state="in_use"}} {pool["in_use"]}',
+        f'db_pool_connections{{state="idle"}} {pool["idle"]}',
+        f'db_pool_connections{{state="waiting"}} {pool["waiting"]}',
+        "# HELP db_pool_connections_created_total Connections opened by the sync pool.",
+        "# TYPE db_pool_connections_created_total counter",
+        f'db_pool_connections_created_total {pool["created"]}',
+    ]
+    events = chart_events.stats()
+    extra += [
+        "# HELP chart_events_subscribers Open GET /charts/events streams.",
+        "# TYPE chart_events_subscribers gauge",
+        f'chart_events_subscribers {events["subscribers"]}',
+        "# HELP chart_events_received_total Chart update notifications received from Postgres.",
+        "# TYPE chart_events_received_total counter",
+        f'chart_events_received_total {events["received"]}',
+        "# HELP chart_events_dropped_total Events dropped because a subscriber fell behind.",
+        "# TYPE chart_events_dropped_total counter",
+        f'chart_events_dropped_total {events["dropped"]}',
+    ]
+    return PlainTextResponse(render_metrics(extra), media_type="text/plain; version=0.0.4")
+
+
+@app.exception_handler(PoolTimeout)
+def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    logging.error(f"Database pool exhausted: {exc}")
+    return JSONResponse(status_code=503, content={"detail": "Database is busy, try again later"})
+
+
+@app.exception_handler(StoreError)
+def store_error_handler(request: Request, exc: StoreError):
+    return JSONResponse(status_code=500, content={"detail": exc.detail})
+
+
+@app.on_event("startup")
+async def start_chart_events():
+    chart_events.start()
+
+
+@app.on_event("shutdown")
+async def close_async_pool():
+    await chart_events.stop()
+    await async_db.close_async_pool()
+
+
+@app.get("/cache/stats", response_model=Dict)
+def get_cache_stats():
+    """Hit/miss counters for the chart response caches."""
+    return {"charts": charts_cache.stats(), "available_dates": available_dates_cache.stats()}
+
+
+@app.get("/db/pool", response_model=Dict)
+def get_pool_stats():
+    """Connection pool usage, for sizing DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE."""
+    return {**pool_stats(), "async": async_db.async_pool_stats()}
+
+
 
 
+def next_page_headers(rows, limit):
+    """Point clients at the next keyset page when this one came back full."""
+    if len(rows) == limit:
+        return {"X-Next-After-Id": str(rows[-1]["id"])}
+    return {}
+
+
+def ndjson_response(rows, to_dict):
+    """Stream rows from an async generator as newline-delimited JSON."""
+    async def lines():
+        async for row in rows:
+            yield dumps(to_dict(row)) + b"\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 # Function to get all songs
-@app.get("/songs", response_model=List[Dict])
-def get_all_songs():
-    connection = get_db_connection()
+@app.get("/songs", response_model=List[Dict], response_class=FastJSONResponse)
+async def get_all_songs(after_id: int = Query(0, ge=0, description="Return songs with an id greater than this"),
+                        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        format: str = Query("json", regex="^(json|ndjson)$")):
+    if format == "ndjson":
+        # Whole table from after_id on, one song per line; limit only applies to paged JSON
+        return ndjson_response(async_db.stream_songs(after_id), lambda song: dict(song))
+
     try:
-        with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-            cursor.execute("""
-                SELECT id, title, album, duration, spotify_url, key, genre, language, artist_id 
-                FROM songs;
-            """)
-            songs = cursor.fetchall()
-            if not songs:
-                raise HTTPException(status_code=404, detail="No songs found")
-            return songs
-    except psycopg2.Error as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {e.pgcode} - {e.pgerror}")
-    finally:
-        connection.close()
+        songs = await async_db.fetch_songs(after_id, limit)
+        if not songs and after_id == 0:
+            raise HTTPException(status_code=404, detail="No songs found")
+        # Trusted rows straight from the database: skip response_model re-validation
+        return FastJSONResponse([dict(song) for song in songs], headers=next_page_headers(songs, limit))
+    except asyncpg.PostgresError as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {e.sqlstate} - {e}")
 
 
 
@@ -157,9 +258,61 @@ def get_song_by_id(song_id: int = Path(..., description="The ID of the song to r
 
 
 
+# Function to get the chart history of a song
+@app.get("/songs/{song_id}/history", response_model=Dict, response_class=FastJSONResponse)
+async def get_song_history(song_id: int = Path(..., description="The ID of the song"),
+                           date_from: Optional[str] = Query(None, alias="from", regex=r"^\d{4}-\d{2}-\d{2}$"),
+                           date_to: Optional[str] = Query(None, alias="to", regex=r"^\d{4}-\d{2}-\d{2}$"),
+                           country: Optional[str] = Query(None)):
+    """
+    Positions of one song across dates and countries, as parallel arrays:
+    dates[i], countries[i] and positions[i] describe one chart entry.
+    """
+    _validate_dates(*(date for date in (date_from, date_to) if date))
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+
+    try:
+        rows = await async_db.fetch_song_history(song_id, date_from, date_to, country)
+        if not rows and not await async_db.song_exists(song_id):
+            raise HTTPException(status_code=404, detail=f"Song with id {song_id} not found")
+
+        return FastJSONResponse({
+            "song_id": song_id,
+            "dates": [str(row[0]) for row in rows],
+            "countries": [row[1] for row in rows],
+            "positions": [row[2] for row in rows],
+        })
+
+    except (HTTPException, PoolTimeout):
+        raise
+    except Exception as e:
+        logging.error(f"Failed to fetch history for song {song_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch song history")
+
+
+
+
+def _republish_chart_dates(dates):
+    """
+    Rebuild the /charts snapshots and the stats rollup of dates whose songs or artists
+    were edited in place, and drop their cached responses.
+
+    Run as a background task once the response is sent: an artist charting for a year
+    means hundreds of rebuilds. The edit is already committed, so failures are logged.
+    """
+    for date in dates:
+        invalidate_chart_date(date)
+        try:
+            rebuild_snapshots(date)
+            refresh_chart_stats(date)
+        except Exception as e:
+            logging.error(f"Failed to republish charts for date {date}: {e}")
+
+
 # Function to update a song by ID
 @app.put("/songs/{song_id}", response_model=Dict)
-def update_song(song_id: int, song: SongUpdateRequest):
+def update_song(song_id: int, song: SongUpdateRequest, background_tasks: BackgroundTasks):
     connection = get_db_connection()
     try:
         cursor = connection.cursor()
@@ -173,11 +326,13 @@ def update_song(song_id: int, song: SongUpdateRequest):
               song.key, song.genre, song.language, song_id))
 
         updated_song = cursor.fetchone()
+        cursor.execute("SELECT DISTINCT date FROM charts WHERE song_id = %s ORDER BY date;", (song_id,))
+        dates = [row[0] for row in cursor.fetchall()]
         connection.commit()
         if not updated_song:
             raise HTTPException(status_code=404, detail=f"Song with id {song_id} not found")
 
-        return {
+        result = {
             "id": updated_song[0],
             "title": updated_song[1],
             "artist_id": updated_song[2],
@@ -189,6 +344,9 @@ def update_song(song_id: int, song: SongUpdateRequest):
             "language": updated_song[8]
         }
 
+    except psycopg2.errors.UniqueViolation:
+        connection.rollback()
+        raise HTTPException(status_code=409, detail="Another song with this title already exists for this artist")
     except psycopg2.Error as e:
         connection.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {e.pgcode} - {e.pgerror}")
@@ -197,15 +355,19 @@ def update_song(song_id: int, song: SongUpdateRequest):
         cursor.close()
         connection.close()
 
+    # /charts and /stats are served from snapshots and rollups: republish every date the song charts on
+    background_tasks.add_task(_republish_chart_dates, dates)
+    return result
+
 
 @app.post("/songs", response_model=int)
-def create_song(song: SongCreateRequest):
+def create_song(song: SongCreateRequest, background_tasks: BackgroundTasks):
     """
     Create a new song in the database.
     """
     try:
         # Use the function you've defined to add the song
-        song_id = add_song(
+        song_id, existed = upsert_song(
             title=song.title,
             artist_id=song.artist_id,
             album=song.album,
@@ -215,9 +377,12 @@ def create_song(song: SongCreateRequest):
             genre=song.genre,
             language=song.language
         )
+        if existed:
+            # The upsert may have refreshed a charted song's features
+            background_tasks.add_task(_republish_chart_dates, charted_dates(song_id=song_id))
         return song_id
-    except HTTPException as he:
-        raise he
+    except (HTTPException, StoreError):
+        raise
     except Exception as e:
         logging.error(f"An error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail="An internal error occurred")
@@ -228,339 +393,294 @@ logging.basicConfig(level=logging.INFO)
 
 
 
-# Function to add a new song
-def add_song(title, artist_id, album=None, duration=None, spotify_url=None, key=None, genre=None, language=None):
+@app.post("/charts/bulk", response_model=Dict)
+def create_charts_bulk(chart_data: ChartData, background_tasks: BackgroundTasks):
     """
-    Insert a song into the songs table without checking for conflicts.
+    Ingest a whole scrape (many countries, many songs) in one transaction.
     """
-    connection = get_db_connection()
-    cursor = connection.cursor()
-
-    try:
-        cursor.execute(
-            """
-            INSERT INTO songs (title, artist_id, album, duration, spotify_url, key, genre, language)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id;
-            """,
-            (title, artist_id, album, duration, spotify_url, key, genre, language)
-        )
-        song_id = cursor.fetchone()[0]
-        connection.commit()
-        logging.info(f"Song added: {title} by artist_id {artist_id}, song_id {song_id}")
-        return song_id
-
-    except Exception as e:
-        connection.rollback()
-        logging.error(f"Failed to insert song {title}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to insert song")
-
-    finally:
-        cursor.close()
-        connection.close()
+    # A StoreError becomes a 500 through store_error_handler
+    result = add_charts_bulk(chart_data)
+    # The charts are committed: a failing rebuild must not turn this into an error the client retries
+    background_tasks.add_task(_republish_chart_dates, [chart_data.date])
+    return result
 
 
-# Function to add a country
-def add_country(country_name):
-    """Insert or fetch the country ID based on the country name."""
-    connection = get_db_connection()
-    if not connection:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    cursor = connection.cursor()
 
-    try:
-        # Ensure the country name is a string and query the database
-        cursor.execute("SELECT id FROM countries WHERE name = %s", (country_name,))
-        country = cursor.fetchone()
-
-        # If the country doesn't exist, insert it
-        if not country:
-            cursor.execute("INSERT INTO countries (name) VALUES (%s) RETURNING id", (country_name,))
-            country_id = cursor.fetchone()[0]
-            connection.commit()
-            logging.info(f"Inserted new country: {country_name} with id {country_id}")
-        else:
-            country_id = country[0]
-            logging.info(f"Country '{country_name}' already exists with id {country_id}")
-
-        return country_id
 
-    except Exception as e:
-        connection.rollback()
-        logging.error(f"Failed to insert or fetch country '{country_name}': {e}")
-        raise HTTPException(status_code=500, detail="Failed to insert or fetch country")
+def build_available_dates(rows):
+    """Nest chart dates as {year: {month: [day, ...]}}."""
+    available_dates = {}
+    for row in rows:
+        date = row[0]
+        year = date.year
+        month = date.month
+        day = date.day
 
-    finally:
-        cursor.close()
-        connection.close()
+        if str(year) not in available_dates:
+            available_dates[str(year)] = {}
 
+        if str(month) not in available_dates[str(year)]:
+            available_dates[str(year)][str(month)] = []
 
+        available_dates[str(year)][str(month)].append(str(day))
 
+    return available_dates
 
-# Function to add a chart date
-def add_chart_date(date):
-    """
-    Insert a date into the chart_dates table if it does not exist.
-    """
-    connection = get_db_connection()
-    cursor = connection.cursor()
 
+@app.get("/charts", response_model=Dict, response_class=FastJSONResponse)
+async def get_charts(request: Request,
+                     date: str = Query(..., regex=r"^\d{4}-\d{2}-\d{2}$"),
+                     source: str = Query("youtube_RightNow")):
     try:
-        # Insert date if it does not exist using ON CONFLICT DO NOTHING
-        cursor.execute(
-            "INSERT INTO chart_dates (date) VALUES (%s) ON CONFLICT (date) DO NOTHING;",
-            (date,)
-        )
-        connection.commit()
-        logging.info(f"Chart date '{date}' added to chart_dates table")
+        # Validate the date format
+        datetime.datetime.strptime(date, '%Y-%m-%d')
 
+        encoded_body = charts_cache.get((date, source))
+        if encoded_body is None:
+            # Pre-serialized snapshot first, the full join only if it has not been built yet
+            body = await async_db.fetch_chart_snapshot(date, source)
+            if body is None:
+                rows = await async_db.fetch_charts(date, source)
+                if not rows:
+                    raise HTTPException(status_code=404, detail="No chart data found for the given date")
+                body = serialize_payload(build_charts_payload(date, rows))
+            encoded_body = EncodedBody(body)
+            charts_cache.set((date, source), encoded_body)
+
+        return conditional_response(request, encoded_body)
+
+    except (HTTPException, PoolTimeout):
+        raise
     except Exception as e:
-        connection.rollback()
-        logging.error(f"Failed to insert or retrieve chart date '{date}': {e}")
-        raise HTTPException(status_code=500, detail="Failed to insert or retrieve chart date")
+        logging.error(f"Failed to fetch chart data for date '{date}': {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch chart data")
 
-    finally:
-        cursor.close()
-        connection.close()
 
+def _validate_dates(*dates):
+    """Reject dates that match YYYY-MM-DD but do not exist (e.g. 2024-02-30) with a 400."""
+    for date in dates:
+        try:
+            datetime.date.fromisoformat(date)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid date '{date}', use YYYY-MM-DD")
 
 
-# Function to add a song source
-def add_song_source(song_id, source_name):
+@app.get("/charts/range")
+async def get_charts_range(date_from: str = Query(..., alias="from", regex=r"^\d{4}-\d{2}-\d{2}$"),
+                           date_to: str = Query(..., alias="to", regex=r"^\d{4}-\d{2}-\d{2}$"),
+                           source: str = Query("youtube_RightNow"),
+                           countries: Optional[str] = Query(None, description="Comma-separated country names")):
     """
-    Add a source for a song in the song_sources table. If the source does not exist, it will be inserted.
+    Stream the charts for every date in [from, to] as NDJSON, one /charts-shaped document per line.
     """
-    connection = get_db_connection()
-    cursor = connection.cursor()
-
-    try:
-        cursor.execute("SELECT id FROM sources WHERE name = %s", (source_name,))
-        source_id = cursor.fetchone()
-
-        if not source_id:
-            cursor.execute("INSERT INTO sources (name) VALUES (%s) RETURNING id", (source_name,))
-            source_id = cursor.fetchone()[0]
-            connection.commit()
-            logging.info(f"Source '{source_name}' added with id {source_id}")
-        else:
-            source_id = source_id[0]
-
-        cursor.execute(
-            """
-            INSERT INTO song_sources (song_id, source_id)
-            VALUES (%s, %s)
-            ON CONFLICT (song_id, source_id) DO NOTHING;
-            """,
-            (song_id, source_id)
-        )
-        connection.commit()
-        logging.info(f"Song source relationship added for song_id {song_id} and source_id {source_id}")
-
-    except Exception as e:
-        connection.rollback()
-        logging.error(f"Failed to insert song source for song_id {song_id} and source '{source_name}': {e}")
-        raise HTTPException(status_code=500, detail="Failed to insert song source")
-
-    finally:
-        cursor.close()
-        connection.close()
-
-
-# Function to add chart entry
-def add_chart(date, country_id, song_id, position):
+    # Validated here: once streaming starts, errors can no longer become a 400
+    _validate_dates(date_from, date_to)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    country_list = [c.strip() for c in countries.split(",") if c.strip()] if countries else None
+
+    rows = async_db.stream_charts_range(date_from, date_to, source, country_list)
+
+    async def lines():
+        # Rows arrive ordered by date, so only one date's rows are held at a time
+        current_date, current_rows = None, []
+        async for row in rows:
+            if row[0] != current_date and current_rows:
+                yield serialize_payload(build_charts_payload(str(current_date), current_rows)) + b"\n"
+                current_rows = []
+            current_date = row[0]
+            current_rows.append(tuple(row)[1:])
+        if current_rows:
+            yield serialize_payload(build_charts_payload(str(current_date), current_rows)) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/charts/events")
+async def get_chart_events(request: Request,
+                           country: Optional[str] = Query(None, description="Only events for this country"),
+                           source: Optional[str] = Query(None, description="Only events for this source")):
     """
-    Insert a chart entry into the charts table. If it already exists, do nothing.
+    Server-sent events: one `chart-updated` event per (date, country, source) whose chart
+    changed, carrying the new snapshot version. Clients refetch only that chart instead of
+    polling. `country` is null when the change list was too large to send per country.
     """
-    connection = get_db_connection()
-    cursor = connection.cursor()
+    queue = chart_events.subscribe()
 
+    async def events():
+        try:
+            yield b"retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=CHART_EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield b": keep-alive\n\n"
+                    continue
+                if source and event["source"] != source:
+                    continue
+                for event_country in event["countries"] if event["countries"] is not None else [None]:
+                    if country and event_country not in (country, None):
+                        continue
+                    data = dumps({"date": event["date"], "country": event_country,
+                                  "source": event["source"], "version": event["version"]})
+                    yield b"event: chart-updated\ndata: " + data + b"\n\n"
+        finally:
+            chart_events.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/charts/diff", response_model=Dict, response_class=FastJSONResponse)
+async def get_charts_diff(date_from: str = Query(..., alias="from", regex=r"^\d{4}-\d{2}-\d{2}$"),
+                          date_to: str = Query(..., alias="to", regex=r"^\d{4}-\d{2}-\d{2}$"),
+                          country: Optional[str] = Query(None, description="Limit to one country; default is all")):
+    """
+    What changed between two chart dates, per country: songs that entered, songs that
+    dropped out, and songs that moved (delta > 0 means the song climbed). Unchanged
+    entries are left out, so the response grows with the number of changes.
+    """
     try:
-        # Insert the chart data; if it exists, it will not insert again due to UNIQUE constraint.
-        cursor.execute("""
-            INSERT INTO charts (date, country_id, song_id, position)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (date, country_id, song_id) DO UPDATE SET position = EXCLUDED.position;
-        """, (date, country_id, song_id, position))
-
-        connection.commit()
-        logging.info(f"Chart data inserted or updated for date {date}, country {country_id}, song {song_id}, position {position}")
+        rows = await async_db.fetch_chart_diff(date_from, date_to, country)
 
+        charts = {}
+        for country_name, song_id, title, artist, previous_position, position in rows:
+            changes = charts.setdefault(country_name, {"new": [], "dropped": [], "moved": []})
+            entry = {"song_id": song_id, "song": title, "artist": artist}
+            if previous_position is None:
+                changes["new"].append({**entry, "position": position})
+            elif position is None:
+                changes["dropped"].append({**entry, "previous_position": previous_position})
+            else:
+                changes["moved"].append({**entry, "position": position, "previous_position": previous_position,
+                                         "delta": previous_position - position})
+
+        return FastJSONResponse({"from": date_from, "to": date_to, "charts": charts})
+
+    except (HTTPException, PoolTimeout):
+        raise
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date, use YYYY-MM-DD")
     except Exception as e:
-        connection.rollback()
-        logging.error(f"Failed to insert or update chart data: {e}")
-        raise HTTPException(status_code=500, detail="Failed to insert or update chart data")
-
-    finally:
-        cursor.close()
-        connection.close()
-
+        logging.error(f"Failed to diff charts between '{date_from}' and '{date_to}': {e}")
+        raise HTTPException(status_code=500, detail="Failed to diff chart data")
 
 
+@app.get("/stats", response_model=Dict)
+async def get_stats(date_from: str = Query(..., alias="from", regex=r"^\d{4}-\d{2}-\d{2}$"),
+                    date_to: Optional[str] = Query(None, alias="to", regex=r"^\d{4}-\d{2}-\d{2}$"),
+                    source: str = Query("youtube_RightNow"),
+                    country: Optional[str] = Query(None),
+                    dimension: Optional[List[str]] = Query(None, description="genre, language, key or artist_type"),
+                    by: str = Query("total", regex="^(total|date|country)$")):
+    """
+    Genre, language, key and artist-type distributions from the chart_stats rollup.
 
-@app.get("/charts", response_model=Dict)
-def get_charts(date: str = Query(..., regex=r"^\d{4}-\d{2}-\d{2}$")):
-    connection = get_db_connection()
-    cursor = connection.cursor()
+    Counts cover one date (`from` only) or a date range, optionally for one country,
+    and are grouped into a single total, per date or per country.
+    """
+    date_to = date_to or date_from
+    _validate_dates(date_from, date_to)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if dimension and not set(dimension) <= set(STAT_DIMENSIONS):
+        raise HTTPException(status_code=400, detail=f"dimension must be one of {', '.join(STAT_DIMENSIONS)}")
 
     try:
-        # Validate the date format
-        datetime.datetime.strptime(date, '%Y-%m-%d')
+        rows = await async_db.fetch_chart_stats(date_from, date_to, source, country, dimension, by)
 
-        # Query to get charts data for a specific date from 'youtube_RightNow' source
-        cursor.execute("""
-            SELECT c.name, ch.position, s.title, a.name, s.album, s.duration, s.spotify_url, s.key, s.genre, s.language, a.type
-            FROM charts ch
-            JOIN countries c ON ch.country_id = c.id
-            JOIN songs s ON ch.song_id = s.id
-            JOIN artists a ON s.artist_id = a.id
-            JOIN song_sources ss ON s.id = ss.song_id
-            JOIN sources src ON ss.source_id = src.id
-            WHERE ch.date = %s AND src.name = 'youtube_RightNow'
-            ORDER BY c.name, ch.position;
-        """, (date,))
-
-        rows = cursor.fetchall()
-        if not rows:
-            raise HTTPException(status_code=404, detail="No chart data found for the given date")
-
-        # Structure data into the required response format
-        charts = {}
-        for row in rows:
-            country = row[0]
-            song_data = {
-                "position": row[1],
-                "song": row[2],
-                "artist": row[3],
-                "album": row[4],
-                "duration": str(row[5]),
-                "spotify_url": row[6],
-                "songFeatures": {
-                    "key": row[7],
-                    "genre": row[8],
-                    "language": row[9]
-                },
-                "artistFeatures": {
-                    "type": row[10]
-                }
-            }
-
-            if country not in charts:
-                charts[country] = []
-
-            charts[country].append(song_data)
-
-        return {"date": date, "charts": charts}
+        stats = {}
+        for group, dim, value, count in rows:
+            stats.setdefault(group, {}).setdefault(dim, {})[value] = count
 
-    except Exception as e:
-        logging.error(f"Failed to fetch chart data for date '{date}': {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch chart data")
+        return {"from": date_from, "to": date_to, "source": source, "by": by,
+                "stats": stats.get("total", {}) if by == "total" else stats}
 
-    finally:
-        cursor.close()
-        connection.close()
+    except (HTTPException, PoolTimeout):
+        raise
+    except Exception as e:
+        logging.error(f"Failed to fetch stats for {date_from}..{date_to}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch stats")
 
 
 @app.get("/charts/available-dates", response_model=Dict)
-def get_available_dates():
-    connection = get_db_connection()
-    cursor = connection.cursor()
-
+async def get_available_dates(request: Request):
     try:
-        # Query to get all available dates
-        cursor.execute("SELECT date FROM chart_dates ORDER BY date;")
-        rows = cursor.fetchall()
+        encoded_body = available_dates_cache.get("all")
+        if encoded_body is None:
+            rows = await async_db.fetch_available_dates()
 
-        if not rows:
-            raise HTTPException(status_code=404, detail="No available dates found")
+            if not rows:
+                raise HTTPException(status_code=404, detail="No available dates found")
 
-        # Structure data into the required response format
-        available_dates = {}
-        for row in rows:
-            date = row[0]
-            year = date.year
-            month = date.month
-            day = date.day
+            encoded_body = EncodedBody(serialize_payload(build_available_dates(rows)))
+            available_dates_cache.set("all", encoded_body)
 
-            if str(year) not in available_dates:
-                available_dates[str(year)] = {}
-
-            if str(month) not in available_dates[str(year)]:
-                available_dates[str(year)][str(month)] = []
-
-            available_dates[str(year)][str(month)].append(str(day))
-
-        return available_dates
+        return conditional_response(request, encoded_body)
 
+    except (HTTPException, PoolTimeout):
+        raise
     except Exception as e:
         logging.error(f"Failed to fetch available dates: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch available dates")
 
-    finally:
-        cursor.close()
-        connection.close()
-
-
 
-
-# Function to add a new artist
 @app.post("/artists")
-def add_artist(artist: ArtistData):
-    connection = get_db_connection()
-    if not connection:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    cursor = connection.cursor()
-
+def create_artist(artist: ArtistData, background_tasks: BackgroundTasks):
+    """Insert an artist, or return the id of the existing one with the same normalized name."""
+    artist_id, existed = upsert_artist(artist)
+    if existed:
+        # The upsert may have filled in an Unknown type shown on every chart of the artist
+        background_tasks.add_task(_republish_chart_dates, charted_dates(artist_id=artist_id))
+    return artist_id
+
+
+@app.get("/search", response_model=Dict, response_class=FastJSONResponse)
+async def search(q: str = Query(..., min_length=2, max_length=255),
+                 limit: int = Query(10, ge=1, le=100),
+                 min_similarity: float = Query(0.3, gt=0, le=1)):
+    """
+    Fuzzy search over song titles and artist names, ranked by trigram similarity.
+    """
     try:
-        # Check if the artist already exists
-        cursor.execute("SELECT id FROM artists WHERE name = %s", (artist.name,))
-        artist_id = cursor.fetchone()
-
-        if artist_id:
-            logging.info(f"Artist '{artist.name}' already exists, returning existing ID")
-            return artist_id[0]  # Return the existing artist's ID
-
-        # Insert the artist into the artists table
-        cursor.execute("""
-            INSERT INTO artists (name, type)
-            VALUES (%s, %s)
-            RETURNING id;
-        """, (artist.name, artist.type))
-        
-        artist_id = cursor.fetchone()[0]
-        connection.commit()
-        logging.info(f"Artist '{artist.name}' inserted with id {artist_id}")
-
-        return artist_id
-
+        songs, artists = await async_db.search(q, limit, min_similarity)
+        return FastJSONResponse({
+            "query": q,
+            "songs": [{"id": row[0], "title": row[1], "artist_id": row[2], "artist": row[3],
+                       "score": round(row[4], 3)} for row in songs],
+            "artists": [{"id": row[0], "name": row[1], "type": row[2],
+                         "score": round(row[3], 3)} for row in artists],
+        })
+
+    except (HTTPException, PoolTimeout):
+        raise
     except Exception as e:
-        connection.rollback()
-        logging.error(f"Failed to insert artist '{artist.name}': {e}")
-        raise HTTPException(status_code=500, detail="Failed to insert artist")
-
-    finally:
-        cursor.close()
-        connection.close()
+        logging.error(f"Search for '{q}' failed: {e}")
+        raise HTTPException(status_code=500, detail="Search failed")
 
 
 
 @app.get("/artists", response_model=List[ArtistData])
-def get_all_artists():
-    connection = get_db_connection()
+async def get_all_artists(response: Response,
+                          after_id: int = Query(0, ge=0, description="Return artists with an id greater than this"),
+                          limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                          format: str = Query("json", regex="^(json|ndjson)$")):
+    if format == "ndjson":
+        return ndjson_response(async_db.stream_artists(after_id),
+                               lambda artist: {"id": artist[0], "name": artist[1], "type": artist[2]})
+
     try:
-        cursor = connection.cursor()
-        cursor.execute("SELECT id, name, type FROM artists;")
-        artists = cursor.fetchall()
-        if not artists:
+        artists = await async_db.fetch_artists(after_id, limit)
+        if not artists and after_id == 0:
             raise HTTPException(status_code=404, detail="No artists found")
+        response.headers.update(next_page_headers(artists, limit))
         return [{"id": artist[0], "name": artist[1], "type": artist[2]} for artist in artists]
+    except (HTTPException, PoolTimeout):
+        raise
     except Exception as e:
         logging.error(f"Error fetching artists: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch artists")
-    finally:
-        cursor.close()
-        connection.close()
 
 
 
@@ -585,7 +705,7 @@ def get_artist_by_id(artist_id: int):
 
 
 @app.put("/artists/{artist_id}", response_model=ArtistData)
-def update_artist(artist_id: int, artist: ArtistData):
+def update_artist(artist_id: int, artist: ArtistData, background_tasks: BackgroundTasks):
     connection = get_db_connection()
     try:
         cursor = connection.cursor()
@@ -596,10 +716,23 @@ def update_artist(artist_id: int, artist: ArtistData):
             RETURNING id, name, type;
         """, (artist.name, artist.type, artist_id))
         updated_artist = cursor.fetchone()
+        cursor.execute("""
+            SELECT DISTINCT ch.date
+            FROM charts ch
+            JOIN songs s ON ch.song_id = s.id
+            WHERE s.artist_id = %s
+            ORDER BY ch.date;
+        """, (artist_id,))
+        dates = [row[0] for row in cursor.fetchall()]
         connection.commit()
         if not updated_artist:
             raise HTTPException(status_code=404, detail="Artist not found")
-        return {"id": updated_artist[0], "name": updated_artist[1], "type": updated_artist[2]}
+        result = {"id": updated_artist[0], "name": updated_artist[1], "type": updated_artist[2]}
+    except HTTPException:
+        raise
+    except psycopg2.errors.UniqueViolation:
+        connection.rollback()
+        raise HTTPException(status_code=409, detail="Another artist with this name already exists")
     except Exception as e:
         connection.rollback()
         logging.error(f"Failed to update artist {artist_id}: {e}")
@@ -608,6 +741,10 @@ def update_artist(artist_id: int, artist: ArtistData):
         cursor.close()
         connection.close()
 
+    # /charts and /stats are served from snapshots and rollups: republish every date the artist charts on
+    background_tasks.add_task(_republish_chart_dates, dates)
+    return result
+
 
 
 
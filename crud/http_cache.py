@@ -0,0 +1,98 @@
+import gzip
+import hashlib
+import os
+import threading
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; fall back to gzip only
+    brotli = None
+
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+
+ENCODING_SUFFIX = {"br": "-br", "gzip": "-gz"}
+
+
+class EncodedBody:
+    """
+    A JSON body with its strong ETag and lazily computed compressed variants.
+
+    Instances live in the response caches, so the hash and each compression run
+    at most once per cached entry, no matter how many clients ask for it.
+    """
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        if encoding is None:
+            return self.body
+        with self._lock:
+            if encoding not in self._variants:
+                if encoding == "br":
+                    self._variants[encoding] = brotli.compress(self.body)
+                else:
+                    self._variants[encoding] = gzip.compress(self.body, compresslevel=6)
+            return self._variants[encoding]
+
+
+def negotiate_encoding(request: Request, body):
+    """Pick br or gzip from Accept-Encoding, or None for small bodies and plain clients."""
+    if len(body) < COMPRESS_MIN_SIZE:
+        return None
+    accepted = {
+        part.split(";")[0].strip().lower()
+        for part in request.headers.get("accept-encoding", "").split(",")
+        if not part.strip().endswith(";q=0")
+    }
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def etag_matches(request: Request, etag):
+    """True if If-None-Match names this resource, in any of its encodings."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip().strip('"')
+        for suffix in ENCODING_SUFFIX.values():
+            if candidate.endswith(suffix):
+                candidate = candidate[:-len(suffix)]
+        if candidate == etag:
+            return True
+    return False
+
+
+def conditional_response(request: Request, encoded_body: EncodedBody, media_type="application/json"):
+    """
+    304 when the client already has this version, otherwise the body,
+    compressed when the client accepts it.
+    """
+    encoding = negotiate_encoding(request, encoded_body.body)
+    etag = encoded_body.etag + ENCODING_SUFFIX.get(encoding, "")
+    headers = {
+        "ETag": f'"{etag}"',
+        "Vary": "Accept-Encoding",
+        # Let browsers keep the body but revalidate it on every use
+        "Cache-Control": "no-cache",
+    }
+
+    if etag_matches(request, encoded_body.etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=encoded_body.encoded(encoding), media_type=media_type, headers=headers)
@@ -0,0 +1,183 @@
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+
+
+# Queries slower than this are logged with their SQL and parameters; 0 disables the log
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "500"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_query_logger = logging.getLogger("crud.slow_query")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {series[-1]}")
+        return lines
+
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "Time to produce the response headers, per route.",
+    ("method", "route", "status"))
+request_db_time = Histogram(
+    "http_request_db_seconds", "Database time spent while serving one request, per route.",
+    ("method", "route"))
+db_round_trips = Counter(
+    "db_round_trips_total", "Database round-trips by route, driver and phase (connect, acquire, execute, fetch).",
+    ("route", "driver", "phase"))
+db_operation_time = Histogram(
+    "db_operation_duration_seconds", "Duration of individual database round-trips by driver and phase.",
+    ("driver", "phase"))
+
+REGISTRY = [request_latency, request_db_time, db_round_trips, db_operation_time]
+
+
+class RequestStats:
+    """DB time accumulated for the request currently being served (see metrics_middleware)."""
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.round_trips = {}  # (driver, phase) -> count
+
+
+# Holds the RequestStats of the in-flight request; None outside the API (e.g. in the processor)
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+def observe_db(driver, phase, seconds, sql=None, params=None):
+    """Record one database round-trip, and log it if it was slow."""
+    db_operation_time.observe(seconds, driver=driver, phase=phase)
+    stats = current_request.get()
+    if stats is not None:
+        stats.db_seconds += seconds
+        stats.round_trips[(driver, phase)] = stats.round_trips.get((driver, phase), 0) + 1
+    else:
+        db_round_trips.inc(route="-", driver=driver, phase=phase)
+
+    if sql is not None and SLOW_QUERY_THRESHOLD_MS and seconds * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+        statement = re.sub(r"\s+", " ", sql if isinstance(sql, str) else sql.decode("utf-8", "replace")).strip()
+        slow_query_logger.warning(f"Slow query ({seconds * 1000:.1f} ms, {driver}): {statement} params={params!r:.500}")
+
+
+def finish_request(stats, method, route, status, seconds):
+    request_latency.observe(seconds, method=method, route=route, status=status)
+    request_db_time.observe(stats.db_seconds, method=method, route=route)
+    for (driver, phase), count in stats.round_trips.items():
+        db_round_trips.inc(count, route=route, driver=driver, phase=phase)
+
+
+class InstrumentedCursor:
+    """
+    Wraps a psycopg2 cursor and times execute (statement round-trip) and fetch
+    (materializing rows client-side) separately. Everything else is passed through.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._cursor.__exit__(*exc_info)
+
+    def _timed(self, phase, method, *args, sql=None, params=None):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            observe_db("psycopg2", phase, time.perf_counter() - start, sql=sql, params=params)
+
+    def execute(self, query, params=None):
+        return self._timed("execute", self._cursor.execute, query, params, sql=query, params=params)
+
+    def executemany(self, query, params_seq):
+        return self._timed("execute", self._cursor.executemany, query, params_seq, sql=query)
+
+    def fetchone(self):
+        return self._timed("fetch", self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed("fetch", self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed("fetch", self._cursor.fetchall)
+
+
+def render_metrics(extra_lines=()):
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,63 @@
+import os
+import sys
+import logging
+from crud.db import connect
+
+
+# Versioned schema changes applied on top of init.sql, in file-name order.
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+# Arbitrary key so concurrent runners (API + processor) apply migrations one at a time
+MIGRATION_LOCK_ID = 4815162342
+
+
+def pending_migrations(applied):
+    files = sorted(name for name in os.listdir(MIGRATIONS_DIR) if name.endswith(".sql"))
+    return [name for name in files if name[:-len(".sql")] not in applied]
+
+
+def apply_migrations():
+    """Apply every migration in MIGRATIONS_DIR that is not yet recorded in schema_migrations."""
+    connection = connect()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("SELECT pg_advisory_lock(%s);", (MIGRATION_LOCK_ID,))
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version VARCHAR(255) PRIMARY KEY,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        """)
+        connection.commit()
+
+        cursor.execute("SELECT version FROM schema_migrations;")
+        applied = {row[0] for row in cursor.fetchall()}
+
+        for name in pending_migrations(applied):
+            version = name[:-len(".sql")]
+            with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+                sql = f.read()
+            try:
+                cursor.execute(sql)
+                cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s);", (version,))
+                connection.commit()
+                logging.info(f"Applied migration {version}")
+            except Exception as e:
+                connection.rollback()
+                logging.error(f"Migration {version} failed: {e}")
+                raise
+
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_ID,))
+        connection.commit()
+        cursor.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        apply_migrations()
+    except Exception:
+        sys.exit(1)
@@ -0,0 +1,120 @@
+import argparse
+import datetime
+import logging
+import os
+from crud.db import get_db_connection
+
+
+# How many months of partitions to keep created ahead of today
+CHARTS_PARTITIONS_AHEAD = int(os.getenv("CHARTS_PARTITIONS_AHEAD", "3"))
+# Months of chart history to keep attached; 0 keeps everything
+CHARTS_RETENTION_MONTHS = int(os.getenv("CHARTS_RETENTION_MONTHS", "0"))
+
+
+def add_months(month_start, months):
+    month_index = month_start.year * 12 + month_start.month - 1 + months
+    return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def ensure_future_partitions(months_ahead=CHARTS_PARTITIONS_AHEAD, today=None):
+    """Create the charts partitions for the current month and the next `months_ahead` months."""
+    this_month = (today or datetime.date.today()).replace(day=1)
+    connection = get_db_connection()
+    cursor = connection.cursor()
+
+    try:
+        created = []
+        for offset in range(months_ahead + 1):
+            cursor.execute("SELECT ensure_chart_partition(%s);", (add_months(this_month, offset),))
+            created.append(cursor.fetchone()[0])
+        connection.commit()
+        logging.info(f"Chart partitions present: {', '.join(created)}")
+        return created
+
+    except Exception as e:
+        connection.rollback()
+        logging.error(f"Failed to create chart partitions: {e}")
+        raise
+
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def list_partitions(cursor):
+    """(partition name, lower bound, upper bound) for every attached charts partition."""
+    cursor.execute("""
+        SELECT child.relname,
+               (regexp_match(pg_get_expr(child.relpartbound, child.oid), 'FROM \\(''([^'']+)''\\)'))[1]::date,
+               (regexp_match(pg_get_expr(child.relpartbound, child.oid), 'TO \\(''([^'']+)''\\)'))[1]::date
+        FROM pg_inherits
+        JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+        JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+        WHERE parent.relname = 'charts'
+        ORDER BY 2;
+    """)
+    return cursor.fetchall()
+
+
+def apply_retention(retention_months=CHARTS_RETENTION_MONTHS, drop=False, today=None):
+    """
+    Detach every charts partition that ends before the retention window.
+
+    Detached partitions are renamed to charts_archive_YYYY_MM and kept as plain tables
+    (for dumping or re-attaching), or dropped when `drop` is set. Snapshots, stats and
+    chart_dates for the pruned months are removed so the API stops advertising them.
+    """
+    if retention_months <= 0:
+        logging.info("Chart retention disabled, nothing to detach")
+        return []
+
+    cutoff = add_months((today or datetime.date.today()).replace(day=1), -retention_months)
+    connection = get_db_connection()
+    cursor = connection.cursor()
+
+    try:
+        detached = []
+        for name, lower, upper in list_partitions(cursor):
+            if upper is None or upper > cutoff:
+                continue
+            cursor.execute(f'ALTER TABLE charts DETACH PARTITION "{name}";')
+            if drop:
+                cursor.execute(f'DROP TABLE "{name}";')
+            else:
+                archive = f"charts_archive_{lower:%Y_%m}"
+                cursor.execute(f'ALTER TABLE "{name}" RENAME TO "{archive}";')
+                # The copied foreign keys would cascade the chart_dates cleanup into the archive
+                cursor.execute("""
+                    SELECT conname FROM pg_constraint
+                    WHERE conrelid = %s::regclass AND contype = 'f';
+                """, (archive,))
+                for (constraint,) in cursor.fetchall():
+                    cursor.execute(f'ALTER TABLE "{archive}" DROP CONSTRAINT "{constraint}";')
+            cursor.execute("DELETE FROM chart_dates WHERE date >= %s AND date < %s;", (lower, upper))
+            detached.append(name)
+
+        connection.commit()
+        logging.info(f"Detached chart partitions before {cutoff}: {detached or 'none'}")
+        return detached
+
+    except Exception as e:
+        connection.rollback()
+        logging.error(f"Failed to apply chart retention: {e}")
+        raise
+
+    finally:
+        cursor.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Maintain the month partitions of the charts table.")
+    parser.add_argument("--months-ahead", type=int, default=CHARTS_PARTITIONS_AHEAD)
+    parser.add_argument("--retention-months", type=int, default=CHARTS_RETENTION_MONTHS,
+                        help="detach partitions older than this many months (0 keeps everything)")
+    parser.add_argument("--drop", action="store_true", help="drop detached partitions instead of archiving them")
+    args = parser.parse_args()
+
+    ensure_future_partitions(args.months_ahead)
+    apply_retention(args.retention_months, drop=args.drop)
@@ -0,0 +1,14 @@
+from fastapi.responses import JSONResponse
+from crud.serialization import dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with the fast encoder.
+
+    Returning it from a route skips response_model validation, so only use it for
+    results the API builds itself from trusted database rows.
+    """
+
+    def render(self, content):
+        return dumps(content)
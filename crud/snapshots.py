@@ -0,0 +1,167 @@
+import argparse
+import json
+import logging
+from crud.db import get_db_connection
+from crud.serialization import dumps
+from crud.cache import invalidate_chart_date
+
+
+# Postgres NOTIFY channel for "chart updated" events, consumed by crud.events
+CHART_EVENTS_CHANNEL = "chart_updates"
+# NOTIFY payloads must stay under 8000 bytes; larger country lists are sent as null ("all")
+MAX_EVENT_PAYLOAD = 7900
+
+
+# Same column order as async_db.fetch_charts, consumed by build_charts_payload
+CHART_ROWS_QUERY = """
+    SELECT c.name, ch.position, s.title, a.name, s.album, s.duration, s.spotify_url, s.key, s.genre, s.language, a.type
+    FROM charts ch
+    JOIN countries c ON ch.country_id = c.id
+    JOIN songs s ON ch.song_id = s.id
+    JOIN artists a ON s.artist_id = a.id
+    JOIN song_sources ss ON s.id = ss.song_id
+    JOIN sources src ON ss.source_id = src.id
+    WHERE ch.date = %s AND src.name = %s
+    ORDER BY c.name, ch.position;
+"""
+
+
+def build_charts_payload(date, rows):
+    """Structure chart rows into the /charts response format."""
+    charts = {}
+    for row in rows:
+        country = row[0]
+        song_data = {
+            "position": row[1],
+            "song": row[2],
+            "artist": row[3],
+            "album": row[4],
+            "duration": str(row[5]),
+            "spotify_url": row[6],
+            "songFeatures": {
+                "key": row[7],
+                "genre": row[8],
+                "language": row[9]
+            },
+            "artistFeatures": {
+                "type": row[10]
+            }
+        }
+
+        if country not in charts:
+            charts[country] = []
+
+        charts[country].append(song_data)
+
+    return {"date": date, "charts": charts}
+
+
+def serialize_payload(payload):
+    """Compact JSON bytes, exactly as served by GET /charts."""
+    return dumps(payload)
+
+
+def changed_countries(old_payload, new_payload):
+    """Countries whose chart differs between two serialized snapshots of the same date and source."""
+    old_charts = json.loads(old_payload)["charts"] if old_payload else {}
+    new_charts = json.loads(new_payload)["charts"]
+    return sorted(country for country in set(old_charts) | set(new_charts)
+                  if old_charts.get(country) != new_charts.get(country))
+
+
+def rebuild_snapshots(date, sources=None):
+    """
+    Rebuild the chart_snapshots rows for one date.
+
+    When no sources are given, every source with songs charted on that date is rebuilt.
+    Snapshots whose source no longer has rows for the date are removed. Every snapshot
+    whose payload changed is announced on CHART_EVENTS_CHANNEL with the new version and
+    the countries that changed; Postgres only delivers it once the rebuild commits.
+    """
+    date = str(date)
+    connection = get_db_connection()
+    cursor = connection.cursor()
+
+    try:
+        if sources is None:
+            cursor.execute("""
+                SELECT DISTINCT src.name
+                FROM charts ch
+                JOIN song_sources ss ON ch.song_id = ss.song_id
+                JOIN sources src ON ss.source_id = src.id
+                WHERE ch.date = %s;
+            """, (date,))
+            sources = [row[0] for row in cursor.fetchall()]
+
+        for source in sources:
+            cursor.execute(CHART_ROWS_QUERY, (date, source))
+            rows = cursor.fetchall()
+            if not rows:
+                cursor.execute("DELETE FROM chart_snapshots WHERE date = %s AND source = %s;", (date, source))
+                continue
+
+            payload = serialize_payload(build_charts_payload(date, rows)).decode("utf-8")
+            cursor.execute("SELECT payload FROM chart_snapshots WHERE date = %s AND source = %s;", (date, source))
+            previous = cursor.fetchone()
+
+            # Only bump the version when the document actually changed
+            cursor.execute("""
+                INSERT INTO chart_snapshots (date, source, payload)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (date, source) DO UPDATE
+                SET payload = EXCLUDED.payload,
+                    version = chart_snapshots.version + 1,
+                    updated_at = now()
+                WHERE chart_snapshots.payload IS DISTINCT FROM EXCLUDED.payload
+                RETURNING version;
+            """, (date, source, payload))
+            updated = cursor.fetchone()
+            if updated:
+                event = {"date": date, "source": source, "version": updated[0],
+                         "countries": changed_countries(previous[0] if previous else None, payload)}
+                message = json.dumps(event)
+                if len(message.encode("utf-8")) > MAX_EVENT_PAYLOAD:
+                    message = json.dumps({**event, "countries": None})
+                cursor.execute("SELECT pg_notify(%s, %s);", (CHART_EVENTS_CHANNEL, message))
+
+        cursor.execute("DELETE FROM chart_snapshots WHERE date = %s AND NOT (source = ANY(%s));", (date, list(sources)))
+        connection.commit()
+        invalidate_chart_date(date)
+        logging.info(f"Chart snapshots rebuilt for date {date}, sources {sources}")
+
+    except Exception as e:
+        connection.rollback()
+        logging.error(f"Failed to rebuild chart snapshots for date '{date}': {e}")
+        raise
+
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def rebuild_all_snapshots():
+    """Backfill snapshots for every date in chart_dates."""
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT date FROM chart_dates ORDER BY date;")
+            dates = [row[0] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+    for date in dates:
+        rebuild_snapshots(date)
+    logging.info(f"Rebuilt chart snapshots for {len(dates)} dates")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Rebuild pre-serialized /charts snapshots.")
+    parser.add_argument("--date", action="append", help="rebuild only these dates (YYYY-MM-DD); default is every date in chart_dates")
+    args = parser.parse_args()
+
+    if args.date:
+        for date in args.date:
+            rebuild_snapshots(date)
+    else:
+        rebuild_all_snapshots()
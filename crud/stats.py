@@ -0,0 +1,78 @@
+import argparse
+import logging
+from crud.db import get_db_connection
+
+
+STAT_DIMENSIONS = ("genre", "language", "key", "artist_type")
+
+# One date's rollup rows, counted from its charts
+CHART_STATS_ROLLUP_SQL = """
+    INSERT INTO chart_stats (date, country_id, source_id, dimension, value, count)
+    SELECT ch.date, ch.country_id, ss.source_id, d.dimension, COALESCE(d.value, 'Unknown'), count(*)
+    FROM charts ch
+    JOIN songs s ON ch.song_id = s.id
+    JOIN artists a ON s.artist_id = a.id
+    JOIN song_sources ss ON s.id = ss.song_id
+    CROSS JOIN LATERAL (VALUES
+        ('genre', s.genre),
+        ('language', s.language),
+        ('key', s.key),
+        ('artist_type', a.type)
+    ) AS d(dimension, value)
+    WHERE ch.date = %s
+    GROUP BY ch.date, ch.country_id, ss.source_id, d.dimension, COALESCE(d.value, 'Unknown');
+"""
+
+
+def refresh_chart_stats(date):
+    """
+    Recompute the chart_stats rollup for one date from the charts that landed for it.
+
+    Only that date's rows are touched, so the cost is proportional to one day of charts.
+    """
+    date = str(date)
+    connection = get_db_connection()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("DELETE FROM chart_stats WHERE date = %s;", (date,))
+        cursor.execute(CHART_STATS_ROLLUP_SQL, (date,))
+        connection.commit()
+        logging.info(f"Chart stats refreshed for date {date}")
+
+    except Exception as e:
+        connection.rollback()
+        logging.error(f"Failed to refresh chart stats for date '{date}': {e}")
+        raise
+
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def refresh_all_chart_stats():
+    """Backfill the rollup for every date in chart_dates."""
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT date FROM chart_dates ORDER BY date;")
+            dates = [row[0] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+    for date in dates:
+        refresh_chart_stats(date)
+    logging.info(f"Refreshed chart stats for {len(dates)} dates")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Rebuild the chart_stats rollup.")
+    parser.add_argument("--date", action="append", help="refresh only these dates (YYYY-MM-DD); default is every date in chart_dates")
+    args = parser.parse_args()
+
+    if args.date:
+        for date in args.date:
+            refresh_chart_stats(date)
+    else:
+        refresh_all_chart_stats()
@@ -0,0 +1,697 @@
+"""
+Write helpers shared by the API and the processor.
+
+Only psycopg2 (through crud.db) and the stdlib are imported here, so the processor can
+use these helpers without loading FastAPI, pydantic or uvicorn on every cold start.
+"""
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import psycopg2.extras
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+from crud.db import get_db_connection
+from crud.cache import invalidate_chart_date, invalidate_available_dates
+
+
+# Minimum trigram similarity for the processor to reuse an existing artist spelling
+ARTIST_MATCH_SIMILARITY = float(os.getenv("ARTIST_MATCH_SIMILARITY", "0.9"))
+
+
+class StoreError(Exception):
+    """A write helper failed; `detail` is safe to show to API clients."""
+
+    def __init__(self, detail):
+        super().__init__(detail)
+        self.detail = detail
+
+
+@dataclass
+class Artist:
+    name: str
+    type: Optional[str] = None
+
+
+@dataclass
+class UnitOfWork:
+    connection: object
+    after_commit: List[Callable[[], None]] = field(default_factory=list)
+
+
+# The unit of work the current thread / task is writing through, if any (see unit_of_work)
+_current_unit = contextvars.ContextVar("current_unit_of_work", default=None)
+
+
+@contextlib.contextmanager
+def unit_of_work():
+    """
+    Run every helper called inside the block on one connection and one transaction.
+
+    Helpers stop committing on their own: the block commits once when it exits cleanly
+    and rolls everything back if it raises. Cache invalidations are deferred until the
+    commit, so readers never drop a cached chart for writes that end up rolled back.
+    """
+    if _current_unit.get() is not None:
+        # Nested blocks join the outer transaction
+        yield _current_unit.get()
+        return
+
+    unit = UnitOfWork(get_db_connection())
+    token = _current_unit.set(unit)
+    try:
+        yield unit
+        unit.connection.commit()
+    except BaseException:
+        unit.connection.rollback()
+        raise
+    finally:
+        _current_unit.reset(token)
+        unit.connection.close()
+
+    for callback in unit.after_commit:
+        callback()
+
+
+def _open():
+    """(connection, unit) for one helper call; unit is None when the helper owns its transaction."""
+    unit = _current_unit.get()
+    if unit is not None:
+        return unit.connection, unit
+    return get_db_connection(), None
+
+
+def _commit(connection, unit, *callbacks):
+    """Commit the helper's own transaction and run callbacks, or defer both to the unit of work."""
+    if unit is not None:
+        unit.after_commit.extend(callbacks)
+        return
+    connection.commit()
+    for callback in callbacks:
+        callback()
+
+
+def _rollback(connection, unit):
+    # Inside a unit of work the whole transaction is rolled back by unit_of_work()
+    if unit is None:
+        connection.rollback()
+
+
+def _close(connection, unit):
+    if unit is None:
+        connection.close()
+
+
+# Upserts on the natural keys added in migrations/004_artist_song_identity.sql.
+# A known type or feature replaces NULL / 'Unknown', but never the other way round.
+# xmax is 0 only for freshly inserted rows, so the second column tells inserts from updates.
+ARTIST_UPSERT_SQL = """
+    INSERT INTO artists (name, type)
+    VALUES (%s, %s)
+    ON CONFLICT (name_key) DO UPDATE
+    SET type = CASE WHEN artists.type IS NULL OR artists.type = 'Unknown'
+                    THEN EXCLUDED.type ELSE artists.type END
+    RETURNING id, xmax = 0;
+"""
+
+SONG_UPSERT_SQL = """
+    INSERT INTO songs (title, artist_id, album, duration, spotify_url, key, genre, language)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (title_key, artist_id) DO UPDATE
+    SET album = COALESCE(NULLIF(EXCLUDED.album, 'Unknown'), songs.album),
+        duration = COALESCE(NULLIF(EXCLUDED.duration, '00:00:00'), songs.duration),
+        spotify_url = COALESCE(EXCLUDED.spotify_url, songs.spotify_url),
+        key = COALESCE(NULLIF(EXCLUDED.key, 'Unknown'), songs.key),
+        genre = COALESCE(NULLIF(EXCLUDED.genre, 'Unknown'), songs.genre),
+        language = COALESCE(NULLIF(EXCLUDED.language, 'Unknown'), songs.language)
+    RETURNING id, xmax = 0;
+"""
+
+
+# Function to add a new artist
+def add_artist(artist):
+    """
+    Insert an artist, or return the existing one with the same normalized name.
+
+    `artist` is anything with `name` and `type` attributes (Artist, or the API's ArtistData).
+    """
+    return upsert_artist(artist)[0]
+
+
+def upsert_artist(artist):
+    """add_artist, returning (artist_id, existed): existed is True when a stored artist was updated."""
+    connection, unit = _open()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute(ARTIST_UPSERT_SQL, (artist.name, artist.type))
+        artist_id, inserted = cursor.fetchone()
+        _commit(connection, unit)
+        logging.info(f"Artist '{artist.name}' has id {artist_id}")
+
+        return artist_id, not inserted
+
+    except Exception as e:
+        _rollback(connection, unit)
+        logging.error(f"Failed to insert artist '{artist.name}': {e}")
+        raise StoreError("Failed to insert artist")
+
+    finally:
+        cursor.close()
+        _close(connection, unit)
+
+
+# Function to add a new song
+def add_song(title, artist_id, album=None, duration=None, spotify_url=None, key=None, genre=None, language=None):
+    """
+    Insert a song, or return the existing one with the same normalized title and artist.
+
+    Known values refresh the stored ones; 'Unknown' placeholders never overwrite them.
+    """
+    return upsert_song(title, artist_id, album, duration, spotify_url, key, genre, language)[0]
+
+
+def upsert_song(title, artist_id, album=None, duration=None, spotify_url=None, key=None, genre=None, language=None):
+    """add_song, returning (song_id, existed): existed is True when a stored song was updated."""
+    connection, unit = _open()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute(SONG_UPSERT_SQL, (title, artist_id, album, duration, spotify_url, key, genre, language))
+        song_id, inserted = cursor.fetchone()
+        _commit(connection, unit)
+        logging.info(f"Song upserted: {title} by artist_id {artist_id}, song_id {song_id}")
+        return song_id, not inserted
+
+    except Exception as e:
+        _rollback(connection, unit)
+        logging.error(f"Failed to insert song {title}: {e}")
+        raise StoreError("Failed to insert song")
+
+    finally:
+        cursor.close()
+        _close(connection, unit)
+
+
+# Function to list the dates a song or an artist charts on
+def charted_dates(song_id=None, artist_id=None):
+    """Chart dates of one song, or of every song by one artist, oldest first."""
+    connection, unit = _open()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("""
+            SELECT DISTINCT ch.date
+            FROM charts ch
+            JOIN songs s ON ch.song_id = s.id
+            WHERE s.id = %s OR s.artist_id = %s
+            ORDER BY ch.date;
+        """, (song_id, artist_id))
+        return [row[0] for row in cursor.fetchall()]
+
+    except Exception as e:
+        logging.error(f"Failed to fetch chart dates for song_id {song_id} / artist_id {artist_id}: {e}")
+        raise StoreError("Failed to fetch chart dates")
+
+    finally:
+        cursor.close()
+        _close(connection, unit)
+
+
+# Function to add a country
+def add_country(country_name):
+    """Insert or fetch the country ID based on the country name."""
+    connection, unit = _open()
+    cursor = connection.cursor()
+
+    try:
+        # Single-statement upsert; the no-op update lets RETURNING yield the existing id
+        cursor.execute("""
+            INSERT INTO countries (name) VALUES (%s)
+            ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+            RETURNING id;
+        """, (country_name,))
+        country_id = cursor.fetchone()[0]
+        _commit(connection, unit)
+        logging.info(f"Country '{country_name}' has id {country_id}")
+
+        return country_id
+
+    except Exception as e:
+        _rollback(connection, unit)
+        logging.error(f"Failed to insert or fetch country '{country_name}': {e}")
+        raise StoreError("Failed to insert or fetch country")
+
+    finally:
+        cursor.close()
+        _close(connection, unit)
+
+
+# Function to add a chart date
+def add_chart_date(date):
+    """
+    Insert a date into the chart_dates table if it does not exist.
+    """
+    connection, unit = _open()
+    cursor = connection.cursor()
+
+    try:
+        # Insert date if it does not exist using ON CONFLICT DO NOTHING
+        cursor.execute(
+            "INSERT INTO chart_dates (date) VALUES (%s) ON CONFLICT (date) DO NOTHING;",
+            (date,)
+        )
+        new_date = cursor.rowcount > 0
+        # Make sure the charts partition for this month exists before add_chart writes to it
+        cursor.execute("SELECT ensure_chart_partition(%s);", (date,))
+        _commit(connection, unit, *([invalidate_available_dates] if new_date else []))
+        logging.info(f"Chart date '{date}' added to chart_dates table")
+
+    except Exception as e:
+        _rollback(connection, unit)
+        logging.error(f"Failed to insert or retrieve chart date '{date}': {e}")
+        raise StoreError("Failed to insert or retrieve chart date")
+
+    finally:
+        cursor.close()
+        _close(connection, unit)
+
+
+# Function to add a song source
+def add_song_source(song_id, source_name):
+    """
+    Add a source for a song in the song_sources table. If the source does not exist, it will be inserted.
+    """
+    connection, unit = _open()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("""
+            INSERT INTO sources (name) VALUES (%s)
+            ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+            RETURNING id;
+        """, (source_name,))
+        source_id = cursor.fetchone()[0]
+
+        cursor.execute(
+            """
+            INSERT INTO song_sources (song_id, source_id)
+            VALUES (%s, %s)
+            ON CONFLICT (song_id, source_id) DO NOTHING;
+            """,
+            (song_id, source_id)
+        )
+        # Any chart date this song already appears on may now include it for this source
+        cursor.execute("SELECT DISTINCT date FROM charts WHERE song_id = %s;", (song_id,))
+        charted_dates = [row[0] for row in cursor.fetchall()]
+        _commit(connection, unit, *(functools.partial(invalidate_chart_date, d) for d in charted_dates))
+        logging.info(f"Song source relationship added for song_id {song_id} and source_id {source_id}")
+
+    except Exception as e:
+        _rollback(connection, unit)
+        logging.error(f"Failed to insert song source for song_id {song_id} and source '{source_name}': {e}")
+        raise StoreError("Failed to insert song source")
+
+    finally:
+        cursor.close()
+        _close(connection, unit)
+
+
+# Function to add chart entry
+def add_chart(date, country_id, song_id, position):
+    """
+    Insert a chart entry into the charts table. If it already exists, do nothing.
+    """
+    connection, unit = _open()
+    cursor = connection.cursor()
+
+    try:
+        # Insert the chart data; if it exists, it will not insert again due to UNIQUE constraint.
+        cursor.execute("""
+            INSERT INTO charts (date, country_id, song_id, position)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (date, country_id, song_id) DO UPDATE SET position = EXCLUDED.position;
+        """, (date, country_id, song_id, position))
+
+        _commit(connection, unit, functools.partial(invalidate_chart_date, date))
+        logging.info(f"Chart data inserted or updated for date {date}, country {country_id}, song {song_id}, position {position}")
+
+    except Exception as e:
+        _rollback(connection, unit)
+        logging.error(f"Failed to insert or update chart data: {e}")
+        raise StoreError("Failed to insert or update chart data")
+
+    finally:
+        cursor.close()
+        _close(connection, unit)
+
+
+def _ids_by_name(cursor, table, names):
+    cursor.execute(f"SELECT name, id FROM {table} WHERE name = ANY(%s);", (list(names),))
+    return dict(cursor.fetchall())
+
+
+# Function to add a whole multi-country chart in one transaction
+def add_charts_bulk(chart_data):
+    """
+    Write a full ChartData payload (every country, every song) in a single transaction.
+
+    `chart_data` is anything shaped like the API's ChartData: `date`, and `charts`
+    mapping each country to songs with the ChartData song attributes.
+
+    Uses set-based statements instead of per-song helpers, so the number of
+    round-trips does not grow with the number of songs. Returns the resolved IDs.
+    """
+    date = chart_data.date
+    entries = [(country, song) for country, songs in chart_data.charts.items() for song in songs]
+
+    connection, unit = _open()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("INSERT INTO chart_dates (date) VALUES (%s) ON CONFLICT (date) DO NOTHING;", (date,))
+        new_date = cursor.rowcount > 0
+        cursor.execute("SELECT ensure_chart_partition(%s);", (date,))
+
+        country_names = sorted(chart_data.charts)
+        cursor.execute("""
+            INSERT INTO countries (name) SELECT unnest(%s::varchar[])
+            ON CONFLICT (name) DO NOTHING;
+        """, (country_names,))
+        country_ids = _ids_by_name(cursor, "countries", country_names)
+
+        source_names = sorted({song.source or "Unknown" for _, song in entries})
+        cursor.execute("""
+            INSERT INTO sources (name) SELECT unnest(%s::varchar[])
+            ON CONFLICT (name) DO NOTHING;
+        """, (source_names,))
+        source_ids = _ids_by_name(cursor, "sources", source_names)
+
+        # First type seen wins for artists that are new in this payload
+        artist_types = {}
+        for _, song in entries:
+            artist_types.setdefault(song.artist, song.artistFeatures.type)
+        cursor.execute("""
+            WITH input AS (
+                SELECT * FROM unnest(%s::varchar[], %s::varchar[]) AS v(name, type)
+            ),
+            upserted AS (
+                INSERT INTO artists (name, type)
+                SELECT DISTINCT ON (normalize_name(name)) name, type FROM input
+                ON CONFLICT (name_key) DO UPDATE
+                SET type = CASE WHEN artists.type IS NULL OR artists.type = 'Unknown'
+                                THEN EXCLUDED.type ELSE artists.type END
+                RETURNING id, name_key
+            )
+            SELECT i.name, u.id FROM input i JOIN upserted u ON u.name_key = normalize_name(i.name);
+        """, (list(artist_types), list(artist_types.values())))
+        artist_ids = dict(cursor.fetchall())
+
+        # The same song often charts in several countries: upsert each identity once,
+        # then map every entry back to its row through the normalized key
+        cursor.execute("""
+            WITH input AS (
+                SELECT * FROM unnest(%s::int[], %s::varchar[], %s::int[], %s::varchar[], %s::time[],
+                                     %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[])
+                AS v(ord, title, artist_id, album, duration, spotify_url, key, genre, language)
+            ),
+            upserted AS (
+                INSERT INTO songs (title, artist_id, album, duration, spotify_url, key, genre, language)
+                SELECT DISTINCT ON (normalize_name(title), artist_id)
+                       title, artist_id, album, duration, spotify_url, key, genre, language
+                FROM input
+                ORDER BY normalize_name(title), artist_id, ord
+                ON CONFLICT (title_key, artist_id) DO UPDATE
+                SET album = COALESCE(NULLIF(EXCLUDED.album, 'Unknown'), songs.album),
+                    duration = COALESCE(NULLIF(EXCLUDED.duration, '00:00:00'), songs.duration),
+                    spotify_url = COALESCE(EXCLUDED.spotify_url, songs.spotify_url),
+                    key = COALESCE(NULLIF(EXCLUDED.key, 'Unknown'), songs.key),
+                    genre = COALESCE(NULLIF(EXCLUDED.genre, 'Unknown'), songs.genre),
+                    language = COALESCE(NULLIF(EXCLUDED.language, 'Unknown'), songs.language)
+                RETURNING id, title_key, artist_id
+            )
+            SELECT u.id
+            FROM input i
+            JOIN upserted u ON u.title_key = normalize_name(i.title) AND u.artist_id = i.artist_id
+            ORDER BY i.ord;
+        """, (
+            list(range(len(entries))),
+            [song.song for _, song in entries],
+            [artist_ids[song.artist] for _, song in entries],
+            [song.album for _, song in entries],
+            [song.duration if song.duration and song.duration != 'Unknown' else '00:00:00' for _, song in entries],
+            [song.spotify_url for _, song in entries],
+            [song.songFeatures.key for _, song in entries],
+            [song.songFeatures.genre for _, song in entries],
+            [song.songFeatures.language for _, song in entries],
+        ))
+        song_ids = [row[0] for row in cursor.fetchall()]
+
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO song_sources (song_id, source_id) VALUES %s
+            ON CONFLICT (song_id, source_id) DO NOTHING;
+        """, sorted({(song_id, source_ids[song.source or "Unknown"]) for song_id, (_, song) in zip(song_ids, entries)}),
+            page_size=max(len(song_ids), 1))
+
+        # A song listed twice in one country's chart keeps its best position
+        chart_rows = {}
+        for song_id, (country, song) in zip(song_ids, entries):
+            key = (country_ids[country], song_id)
+            chart_rows[key] = min(song.position, chart_rows.get(key, song.position))
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO charts (date, country_id, song_id, position) VALUES %s
+            ON CONFLICT (date, country_id, song_id) DO UPDATE SET position = EXCLUDED.position;
+        """, [(date, country_id, song_id, position) for (country_id, song_id), position in chart_rows.items()],
+            page_size=max(len(chart_rows), 1))
+
+        _commit(connection, unit, functools.partial(invalidate_chart_date, date),
+                *([invalidate_available_dates] if new_date else []))
+        logging.info(f"Bulk chart ingest for date {date}: {len(country_ids)} countries, {len(song_ids)} songs")
+
+        charts = {}
+        for song_id, (country, song) in zip(song_ids, entries):
+            charts.setdefault(country, []).append({
+                "position": song.position,
+                "song_id": song_id,
+                "artist_id": artist_ids[song.artist],
+            })
+
+        return {
+            "date": date,
+            "countries": country_ids,
+            "sources": source_ids,
+            "artists": artist_ids,
+            "charts": charts,
+        }
+
+    except Exception as e:
+        _rollback(connection, unit)
+        logging.error(f"Failed to bulk insert charts for date '{date}': {e}")
+        raise StoreError("Failed to bulk insert chart data")
+
+    finally:
+        cursor.close()
+        _close(connection, unit)
+
+
+# Function to find an existing artist spelled differently
+def match_artist_name(artist_name, min_similarity=ARTIST_MATCH_SIMILARITY):
+    """
+    Return the stored name of the artist most similar to artist_name, or None.
+
+    Trigram matching ignores punctuation, so "A, B" from YouTube and "A & B" from
+    Billboard resolve to the same artist instead of creating a new row. A failed lookup
+    returns None; inside a unit of work it is isolated by a savepoint so the writes go on.
+    """
+    connection, unit = _open()
+    cursor = connection.cursor()
+
+    try:
+        if unit is not None:
+            cursor.execute("SAVEPOINT match_artist_name;")
+        cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, true);", (str(min_similarity),))
+        cursor.execute("""
+            SELECT name, similarity(name_key, normalize_name(%s)) AS score
+            FROM artists
+            WHERE name_key %% normalize_name(%s)
+            ORDER BY score DESC, id
+            LIMIT 1;
+        """, (artist_name, artist_name))
+        match = cursor.fetchone()
+        if unit is not None:
+            cursor.execute("RELEASE SAVEPOINT match_artist_name;")
+        else:
+            connection.commit()
+
+        if match and match[0] != artist_name:
+            logging.info(f"Artist '{artist_name}' matched existing artist '{match[0]}' (similarity {match[1]:.2f})")
+        return match[0] if match else None
+
+    except Exception as e:
+        if unit is not None:
+            cursor.execute("ROLLBACK TO SAVEPOINT match_artist_name;")
+        else:
+            connection.rollback()
+        logging.error(f"Failed to match artist '{artist_name}': {e}")
+        return None
+
+    finally:
+        cursor.close()
+        _close(connection, unit)
+
+
+# Function to queue songs for background enrichment
+def enqueue_enrichment(song_ids):
+    """
+    Queue the given songs for processor.enrichment_worker, skipping songs (and artists)
+    that are already fully enriched. Queuing a song twice keeps a single job.
+    """
+    connection, unit = _open()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("""
+            INSERT INTO enrichment_jobs (song_id)
+            SELECT s.id
+            FROM songs s
+            JOIN artists a ON s.artist_id = a.id
+            WHERE s.id = ANY(%s)
+              AND (s.spotify_url IS NULL
+                   OR COALESCE(s.key, 'Unknown') = 'Unknown'
+                   OR COALESCE(s.genre, 'Unknown') = 'Unknown'
+                   OR COALESCE(a.type, 'Unknown') = 'Unknown')
+            ON CONFLICT (song_id) DO NOTHING;
+        """, (list(song_ids),))
+        queued = cursor.rowcount
+        _commit(connection, unit)
+        logging.info(f"Queued {queued} of {len(song_ids)} songs for enrichment")
+        return queued
+
+    except Exception as e:
+        _rollback(connection, unit)
+        logging.error(f"Failed to queue songs for enrichment: {e}")
+        raise StoreError("Failed to queue songs for enrichment")
+
+    finally:
+        cursor.close()
+        _close(connection, unit)
+
+
+# Function to lease a batch of enrichment jobs
+def claim_enrichment_jobs(limit, lease_seconds):
+    """
+    Lease up to `limit` due jobs and return their (song_id, title, artist name), oldest
+    first.
+
+    Concurrent workers skip each other's rows. A job that is not completed before its
+    lease runs out (the worker crashed) becomes due again.
+    """
+    connection = get_db_connection()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("""
+            WITH claimed AS (
+                UPDATE enrichment_jobs
+                SET available_at = now() + make_interval(secs => %s),
+                    attempts = attempts + 1
+                WHERE song_id IN (
+                    SELECT song_id FROM enrichment_jobs
+                    WHERE available_at <= now()
+                    ORDER BY enqueued_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING song_id
+            )
+            SELECT s.id, s.title, a.name
+            FROM claimed c
+            JOIN songs s ON c.song_id = s.id
+            JOIN artists a ON s.artist_id = a.id;
+        """, (lease_seconds, limit))
+        jobs = cursor.fetchall()
+        connection.commit()
+        return jobs
+
+    except Exception as e:
+        connection.rollback()
+        logging.error(f"Failed to claim enrichment jobs: {e}")
+        raise StoreError("Failed to claim enrichment jobs")
+
+    finally:
+        cursor.close()
+        connection.close()
+
+
+# Function to store the enrichment of one song
+def update_song_enrichment(song_id, artist_type=None, key=None, genre=None, language=None, spotify_url=None):
+    """
+    Fill in a song's features and its artist's type. Idempotent: known values are never
+    replaced by 'Unknown' / NULL, so replaying a job is harmless. Returns True when
+    anything changed.
+    """
+    connection, unit = _open()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("""
+            UPDATE songs
+            SET key = COALESCE(NULLIF(%(key)s, 'Unknown'), key),
+                genre = COALESCE(NULLIF(%(genre)s, 'Unknown'), genre),
+                language = COALESCE(NULLIF(%(language)s, 'Unknown'), language),
+                spotify_url = COALESCE(%(spotify_url)s, spotify_url)
+            WHERE id = %(song_id)s
+              AND (key, genre, language, spotify_url) IS DISTINCT FROM (
+                  COALESCE(NULLIF(%(key)s, 'Unknown'), key),
+                  COALESCE(NULLIF(%(genre)s, 'Unknown'), genre),
+                  COALESCE(NULLIF(%(language)s, 'Unknown'), language),
+                  COALESCE(%(spotify_url)s, spotify_url));
+        """, {"song_id": song_id, "key": key, "genre": genre, "language": language, "spotify_url": spotify_url})
+        changed = cursor.rowcount > 0
+        cursor.execute("""
+            UPDATE artists a
+            SET type = %s
+            FROM songs s
+            WHERE s.id = %s AND a.id = s.artist_id
+              AND %s <> 'Unknown'
+              AND (a.type IS NULL OR a.type = 'Unknown');
+        """, (artist_type, song_id, artist_type))
+        changed = changed or cursor.rowcount > 0
+        _commit(connection, unit)
+        return changed
+
+    except Exception as e:
+        _rollback(connection, unit)
+        logging.error(f"Failed to store enrichment for song_id {song_id}: {e}")
+        raise StoreError("Failed to store song enrichment")
+
+    finally:
+        cursor.close()
+        _close(connection, unit)
+
+
+# Function to finish enrichment jobs
+def complete_enrichment_jobs(song_ids, changed_ids=()):
+    """
+    Remove finished jobs. Returns the chart dates of the songs in `changed_ids`, whose
+    snapshots need rebuilding.
+    """
+    connection, unit = _open()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("DELETE FROM enrichment_jobs WHERE song_id = ANY(%s);", (list(song_ids),))
+        cursor.execute("SELECT DISTINCT date FROM charts WHERE song_id = ANY(%s) ORDER BY date;", (list(changed_ids),))
+        dates = [row[0] for row in cursor.fetchall()]
+        _commit(connection, unit)
+        return dates
+
+    except Exception as e:
+        _rollback(connection, unit)
+        logging.error(f"Failed to complete enrichment jobs: {e}")
+        raise StoreError("Failed to complete enrichment jobs")
+
+    finally:
+        cursor.close()
+        _close(connection, unit)
@@ -0,0 +1,11 @@
+-- Pre-serialized /charts payloads, one JSON document per (date, source).
+-- Rebuilt by the processor after each message and by `python -m crud.snapshots`.
+CREATE TABLE IF NOT EXISTS chart_snapshots (
+    date DATE NOT NULL,
+    source VARCHAR(255) NOT NULL,
+    payload TEXT NOT NULL, -- Ready-to-send JSON body
+    version BIGINT NOT NULL DEFAULT 1, -- Bumped whenever the payload changes
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (date, source),
+    FOREIGN KEY (date) REFERENCES chart_dates(date) ON DELETE CASCADE
+);
@@ -0,0 +1,17 @@
+-- Indexes for the lookups done by crud/handler.py.
+-- countries.name, sources.name and song_sources (song_id, source_id) are already
+-- covered by their UNIQUE / PRIMARY KEY constraints.
+
+-- add_artist: SELECT id FROM artists WHERE name = %s
+CREATE INDEX IF NOT EXISTS idx_artists_name ON artists (name);
+
+-- Song identity lookups by title + artist, and the songs -> artists join in /charts
+CREATE INDEX IF NOT EXISTS idx_songs_title_artist ON songs (title, artist_id);
+CREATE INDEX IF NOT EXISTS idx_songs_artist_id ON songs (artist_id);
+
+-- /charts joins song_sources to sources and filters on the source name
+CREATE INDEX IF NOT EXISTS idx_song_sources_source_id ON song_sources (source_id, song_id);
+
+-- /charts filters on date (served by the (date, country_id, song_id) unique constraint);
+-- add_song_source looks up the dates a song is charted on
+CREATE INDEX IF NOT EXISTS idx_charts_song_id ON charts (song_id, date);
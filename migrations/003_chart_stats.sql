@@ -0,0 +1,14 @@
+-- Rollup of chart entries per (date, country, source) by song/artist attribute.
+-- Maintained per date by crud.stats.refresh_chart_stats and read by GET /stats.
+CREATE TABLE IF NOT EXISTS chart_stats (
+    date DATE NOT NULL,
+    country_id INT NOT NULL,
+    source_id INT NOT NULL,
+    dimension VARCHAR(20) NOT NULL, -- genre, language, key or artist_type
+    value VARCHAR(255) NOT NULL,
+    count INT NOT NULL,
+    PRIMARY KEY (date, source_id, dimension, country_id, value),
+    FOREIGN KEY (date) REFERENCES chart_dates(date) ON DELETE CASCADE,
+    FOREIGN KEY (country_id) REFERENCES countries(id) ON DELETE CASCADE,
+    FOREIGN KEY (source_id) REFERENCES sources(id) ON DELETE CASCADE
+);
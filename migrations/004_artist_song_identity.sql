@@ -0,0 +1,80 @@
+-- Natural-key identity for artists (normalized name) and songs (normalized title + artist),
+-- merging the duplicates created by the old select-then-insert / insert-always helpers.
+
+CREATE OR REPLACE FUNCTION normalize_name(value TEXT) RETURNS TEXT
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT lower(btrim(regexp_replace(value, '\s+', ' ', 'g')))
+$$;
+
+ALTER TABLE artists ADD COLUMN IF NOT EXISTS name_key TEXT GENERATED ALWAYS AS (normalize_name(name)) STORED;
+ALTER TABLE songs ADD COLUMN IF NOT EXISTS title_key TEXT GENERATED ALWAYS AS (normalize_name(title)) STORED;
+
+-- Merge artists: the lowest id survives and inherits a known type from a duplicate
+CREATE TEMP TABLE artist_merge ON COMMIT DROP AS
+SELECT id AS old_id, min(id) OVER (PARTITION BY name_key) AS new_id
+FROM artists
+WHERE name_key IS NOT NULL;
+DELETE FROM artist_merge WHERE old_id = new_id;
+
+UPDATE artists a
+SET type = dup.type
+FROM (
+    SELECT DISTINCT ON (m.new_id) m.new_id, a2.type
+    FROM artist_merge m
+    JOIN artists a2 ON a2.id = m.old_id
+    WHERE a2.type IS NOT NULL AND a2.type <> 'Unknown'
+    ORDER BY m.new_id, a2.id DESC
+) dup
+WHERE a.id = dup.new_id AND (a.type IS NULL OR a.type = 'Unknown');
+
+UPDATE songs s SET artist_id = m.new_id FROM artist_merge m WHERE s.artist_id = m.old_id;
+DELETE FROM artists WHERE id IN (SELECT old_id FROM artist_merge);
+
+-- Merge songs: the lowest id survives and takes the newest known enrichment values
+CREATE TEMP TABLE song_merge ON COMMIT DROP AS
+SELECT id AS old_id, min(id) OVER (PARTITION BY title_key, artist_id) AS new_id
+FROM songs;
+DELETE FROM song_merge WHERE old_id = new_id;
+
+UPDATE songs s
+SET album = COALESCE(NULLIF(latest.album, 'Unknown'), s.album),
+    duration = COALESCE(NULLIF(latest.duration, '00:00:00'), s.duration),
+    spotify_url = COALESCE(latest.spotify_url, s.spotify_url),
+    key = COALESCE(NULLIF(latest.key, 'Unknown'), s.key),
+    genre = COALESCE(NULLIF(latest.genre, 'Unknown'), s.genre),
+    language = COALESCE(NULLIF(latest.language, 'Unknown'), s.language)
+FROM (
+    SELECT DISTINCT ON (m.new_id) m.new_id, s2.*
+    FROM song_merge m
+    JOIN songs s2 ON s2.id = m.old_id
+    ORDER BY m.new_id, s2.id DESC
+) latest
+WHERE s.id = latest.new_id;
+
+-- Repoint charts; where a date/country already lists the surviving song keep the newest row
+DELETE FROM charts ch
+USING (
+    SELECT ch2.id,
+           row_number() OVER (PARTITION BY ch2.date, ch2.country_id, COALESCE(m.new_id, ch2.song_id)
+                              ORDER BY ch2.id DESC) AS rn
+    FROM charts ch2
+    LEFT JOIN song_merge m ON ch2.song_id = m.old_id
+) ranked
+WHERE ch.id = ranked.id AND ranked.rn > 1;
+
+UPDATE charts ch SET song_id = m.new_id FROM song_merge m WHERE ch.song_id = m.old_id;
+
+INSERT INTO song_sources (song_id, source_id)
+SELECT DISTINCT m.new_id, ss.source_id
+FROM song_sources ss
+JOIN song_merge m ON ss.song_id = m.old_id
+ON CONFLICT (song_id, source_id) DO NOTHING;
+
+-- Remaining song_sources rows of merged songs go away via ON DELETE CASCADE
+DELETE FROM songs WHERE id IN (SELECT old_id FROM song_merge);
+
+ALTER TABLE artists ADD CONSTRAINT artists_name_key_unique UNIQUE (name_key);
+ALTER TABLE songs ADD CONSTRAINT songs_identity_unique UNIQUE (title_key, artist_id);
+
+-- Superseded by songs_identity_unique
+DROP INDEX IF EXISTS idx_songs_title_artist;
@@ -0,0 +1,64 @@
+-- Move charts to declarative range partitioning by month.
+-- Per-date queries then scan a single partition, and old months can be detached cheaply
+-- (see crud/partitions.py).
+
+CREATE OR REPLACE FUNCTION chart_partition_name(for_date DATE) RETURNS TEXT
+LANGUAGE sql STABLE AS $$
+    SELECT 'charts_p' || to_char(date_trunc('month', for_date), 'YYYY_MM')
+$$;
+
+-- Create the month partition holding for_date if it does not exist yet
+CREATE OR REPLACE FUNCTION ensure_chart_partition(for_date DATE) RETURNS TEXT
+LANGUAGE plpgsql AS $$
+DECLARE
+    month_start DATE := date_trunc('month', for_date)::date;
+    partition_name TEXT := chart_partition_name(for_date);
+BEGIN
+    IF to_regclass(partition_name) IS NULL THEN
+        -- Serialize concurrent creators of the same month
+        PERFORM pg_advisory_xact_lock(hashtext(partition_name));
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF charts FOR VALUES FROM (%L) TO (%L)',
+            partition_name, month_start, (month_start + interval '1 month')::date
+        );
+    END IF;
+    RETURN partition_name;
+END
+$$;
+
+ALTER TABLE charts RENAME TO charts_unpartitioned;
+ALTER INDEX IF EXISTS charts_pkey RENAME TO charts_unpartitioned_pkey;
+ALTER INDEX IF EXISTS charts_date_country_id_song_id_key RENAME TO charts_unpartitioned_date_country_id_song_id_key;
+ALTER INDEX IF EXISTS idx_charts_song_id RENAME TO charts_unpartitioned_song_id_idx;
+
+-- Unique keys on a partitioned table must include the partition key, hence (id, date)
+CREATE TABLE charts (
+    id INT NOT NULL DEFAULT nextval('charts_id_seq'),
+    date DATE NOT NULL,
+    country_id INT NOT NULL,
+    song_id INT NOT NULL,
+    position INT NOT NULL,
+    PRIMARY KEY (id, date),
+    FOREIGN KEY (date) REFERENCES chart_dates(date) ON DELETE CASCADE,
+    FOREIGN KEY (country_id) REFERENCES countries(id) ON DELETE CASCADE,
+    FOREIGN KEY (song_id) REFERENCES songs(id) ON DELETE CASCADE,
+    UNIQUE (date, country_id, song_id) -- Ensures no duplicate entries for the same date, country, and song
+) PARTITION BY RANGE (date);
+
+ALTER SEQUENCE charts_id_seq OWNED BY charts.id;
+
+CREATE INDEX IF NOT EXISTS idx_charts_song_id ON charts (song_id, date);
+
+-- Partitions for every month with data, plus the next three months
+SELECT ensure_chart_partition(month::date)
+FROM generate_series(
+    date_trunc('month', COALESCE((SELECT min(date) FROM charts_unpartitioned), current_date)),
+    date_trunc('month', GREATEST(COALESCE((SELECT max(date) FROM charts_unpartitioned), current_date), current_date))
+        + interval '3 months',
+    interval '1 month'
+) AS month;
+
+INSERT INTO charts (id, date, country_id, song_id, position)
+SELECT id, date, country_id, song_id, position FROM charts_unpartitioned;
+
+DROP TABLE charts_unpartitioned;
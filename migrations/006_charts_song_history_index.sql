@@ -0,0 +1,6 @@
+-- Covering index for GET /songs/{song_id}/history: every column the query reads is in
+-- the index, so years of positions come from an index-only scan on each partition.
+CREATE INDEX IF NOT EXISTS idx_charts_song_history ON charts (song_id, date, country_id, position);
+
+-- Superseded by the covering index (same leading columns)
+DROP INDEX IF EXISTS idx_charts_song_id;
@@ -0,0 +1,6 @@
+-- Fuzzy, ranked matching for GET /search and for near-duplicate artist names in the processor.
+-- Indexed on the normalized keys so case and spacing do not count against a match.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_songs_title_trgm ON songs USING gin (title_key gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_artists_name_trgm ON artists USING gin (name_key gin_trgm_ops);
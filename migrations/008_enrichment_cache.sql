@@ -0,0 +1,13 @@
+-- Persistent cache of the processor's MusicBrainz and Spotify lookups, so repeat scrapes
+-- of the same songs skip the external APIs. Maintained by processor.enrichment_cache.
+CREATE TABLE IF NOT EXISTS enrichment_cache (
+    kind VARCHAR(32) NOT NULL, -- 'artist' (MusicBrainz) or 'song' (Spotify)
+    key TEXT NOT NULL, -- Normalized artist name, or normalized title + artist
+    value JSONB, -- NULL caches a "not found" answer
+    expires_at TIMESTAMPTZ NOT NULL,
+    last_used_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (kind, key)
+);
+
+-- Least recently used entries are evicted first when a kind grows past its size bound
+CREATE INDEX IF NOT EXISTS idx_enrichment_cache_last_used ON enrichment_cache (kind, last_used_at);
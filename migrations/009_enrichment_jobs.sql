@@ -0,0 +1,11 @@
+-- Work table for two-phase ingest: the processor stores charts without enrichment and
+-- queues each song here; processor.enrichment_worker fills in the features later.
+CREATE TABLE IF NOT EXISTS enrichment_jobs (
+    song_id INT PRIMARY KEY, -- One pending job per song, however often it is queued
+    enqueued_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    available_at TIMESTAMPTZ NOT NULL DEFAULT now(), -- Claimed jobs are leased until this time
+    attempts INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (song_id) REFERENCES songs(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_enrichment_jobs_available ON enrichment_jobs (available_at, enqueued_at);
@@ -0,0 +1,255 @@
+"""
+MusicBrainz and Spotify lookups for chart songs, used by the background enrichment
+worker (processor.enrichment_worker). Lookups go through the persistent enrichment cache and
+per-API rate limiters, and run concurrently.
+"""
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import spotipy
+from spotipy.oauth2 import SpotifyClientCredentials
+from processor.enrichment_cache import artist_cache, song_cache, artist_key, song_key
+from processor.rate_limit import TokenBucket, CallCounter
+
+
+SPOTIPY_CLIENT_ID = os.getenv('SPOTIPY_CLIENT_ID', 'bc6df3eb13b547769c8e7b761b1cf458')
+SPOTIPY_CLIENT_SECRET = os.getenv('SPOTIPY_CLIENT_SECRET', 'bc9faad6721d4e998656b89ff853f4db')
+
+# Concurrent lookups per batch, and the per-API request rates they share
+ENRICHMENT_WORKERS = int(os.getenv('ENRICHMENT_WORKERS', '8'))
+# MusicBrainz gets its own pool: its 1 req/s limiter would otherwise park the Spotify workers
+MUSICBRAINZ_WORKERS = int(os.getenv('MUSICBRAINZ_WORKERS', '2'))
+MUSICBRAINZ_RATE = float(os.getenv('MUSICBRAINZ_RATE', '1'))  # MusicBrainz allows ~1 request/s
+SPOTIFY_RATE = float(os.getenv('SPOTIFY_RATE', '0'))  # 0: no fixed rate, back off on 429 Retry-After only
+musicbrainz_limiter = TokenBucket(MUSICBRAINZ_RATE)
+spotify_limiter = TokenBucket(SPOTIFY_RATE)
+# Ids per call to Spotify's multi-id endpoints (their documented maximums)
+SPOTIFY_AUDIO_FEATURES_BATCH = 100
+SPOTIFY_ARTISTS_BATCH = 50
+# External API calls made for the batch being enriched
+external_calls = CallCounter()
+
+# Setup Spotify API client
+sp = spotipy.Spotify(
+    auth_manager=SpotifyClientCredentials(client_id=SPOTIPY_CLIENT_ID, client_secret=SPOTIPY_CLIENT_SECRET),
+    requests_timeout=100,  # Increase the timeout to 20 seconds
+    # spotipy retries 429 by default, sleeping in the one worker that got it and dropping
+    # Retry-After; leave 429 to spotify_call so the shared limiter pauses every worker
+    status_forcelist=(500, 502, 503, 504)
+)
+
+
+# Returned when Spotify has nothing for a song, or the lookup failed
+UNKNOWN_SONG_FEATURES = {
+    'key': 'Unknown',
+    'genre': 'Unknown',
+    'language': 'Unknown',
+    'album': 'Unknown',
+    'duration': 'Unknown',
+    'spotify_url': None
+}
+
+
+def lookup_artist_data(artist_name):
+    """Query MusicBrainz for an artist. Returns None when it has no match; raises on failure."""
+    url = f"https://musicbrainz.org/ws/2/artist/?query=artist:{artist_name}&fmt=json"
+    musicbrainz_limiter.acquire()
+    external_calls.inc("musicbrainz")
+    response = requests.get(url)
+    if response.status_code == 503:
+        # MusicBrainz answers 503 when its rate limit is exceeded: slow every worker down
+        musicbrainz_limiter.pause(float(response.headers.get("Retry-After", 1)))
+    response.raise_for_status()
+    data = response.json()
+    if not data['artists']:
+        return None
+    artist_info = data['artists'][0]
+    logging.info(f"Fetched artist data for artist: {artist_name}")
+    return {
+        'artist_name': artist_info.get('name', 'Unknown'),
+        'country': artist_info.get('country', 'Unknown'),
+        'gender': artist_info.get('gender', 'Unknown'),
+        'disambiguation': artist_info.get('disambiguation', 'None'),
+        'aliases': ', '.join(alias['name'] for alias in artist_info.get('aliases', [])),
+        'tags': ', '.join(tag['name'] for tag in artist_info.get('tags', [])),
+        'type': artist_info.get('type', 'Unknown')  # Fetch artist type
+    }
+
+
+def fetch_artist_data(artist_name):
+    """Fetch artist data from MusicBrainz API, through the persistent enrichment cache."""
+    key = artist_key(artist_name)
+    hit, artist_data = artist_cache.get(key)
+    if hit:
+        return artist_data
+
+    try:
+        artist_data = lookup_artist_data(artist_name)
+    except Exception as e:
+        # Failures are not cached, so the next scrape tries again
+        logging.error(f"Error fetching artist data: {e}")
+        return None
+
+    artist_cache.set(key, artist_data)
+    return artist_data
+
+
+def spotify_call(method, *args, max_retries=5, **kwargs):
+    """Call a Spotify client method through the shared limiter, backing off on 429 Retry-After."""
+    for _ in range(max_retries):
+        spotify_limiter.acquire()
+        external_calls.inc(f"spotify.{method.__name__}")
+        try:
+            return method(*args, **kwargs)
+        except spotipy.exceptions.SpotifyException as e:
+            if e.http_status != 429:  # Too Many Requests
+                raise e  # Re-raise other exceptions
+            retry_after = int((e.headers or {}).get("Retry-After", 1))  # Retry after time in seconds
+            logging.warning(f"Rate limit reached. Pausing Spotify calls for {retry_after} seconds.")
+            # Every worker waits, not just this one: the limit applies to the whole client
+            spotify_limiter.pause(retry_after)
+
+    raise RuntimeError(f"Max retries reached for Spotify call {method.__name__}")
+
+
+def search_track(song_name, artist_name):
+    """First Spotify search hit for a song, or None when Spotify has no match; raises on failure."""
+    # Search for the song on Spotify using song and artist names
+    query = f"track:{song_name} artist:{artist_name}"
+    results = spotify_call(sp.search, q=query, type='track', limit=1)
+    if not results['tracks']['items']:
+        return None
+    track = results['tracks']['items'][0]
+    logging.info(f"Found track '{track['name']}' by '{artist_name}' on Spotify with ID: {track['id']}")
+    return track
+
+
+def fetch_audio_features(track_ids):
+    """{track id: audio features} in batches of SPOTIFY_AUDIO_FEATURES_BATCH ids per call."""
+    features = {}
+    for i in range(0, len(track_ids), SPOTIFY_AUDIO_FEATURES_BATCH):
+        batch = track_ids[i:i + SPOTIFY_AUDIO_FEATURES_BATCH]
+        for track_id, track_features in zip(batch, spotify_call(sp.audio_features, batch) or []):
+            if track_features:
+                features[track_id] = track_features
+    return features
+
+
+def fetch_artist_genres(artist_ids):
+    """{Spotify artist id: genres} in batches of SPOTIFY_ARTISTS_BATCH ids per call."""
+    genres = {}
+    for i in range(0, len(artist_ids), SPOTIFY_ARTISTS_BATCH):
+        batch = artist_ids[i:i + SPOTIFY_ARTISTS_BATCH]
+        for artist in spotify_call(sp.artists, batch)['artists']:
+            if artist:
+                genres[artist['id']] = artist.get('genres', [])
+    return genres
+
+
+def track_features(track, audio_features, genres):
+    """Merge one track's search result with its audio features and artist genres."""
+    album_name = track['album']['name'] if 'album' in track and track['album']['name'] else 'Unknown'  # Get the album name
+    duration_ms = track['duration_ms']  # Get the track duration in milliseconds
+
+    # Convert duration to minutes:seconds format
+    if duration_ms is not None:
+        duration_minutes = duration_ms // 60000
+        duration_seconds = (duration_ms % 60000) // 1000
+        duration = f"{duration_minutes}:{duration_seconds:02d}"  # Format as mm:ss
+    else:
+        duration = 'Unknown'
+
+    # Return key, genre, language, album, duration, and Spotify URL
+    return {
+        'key': audio_features.get('key', 'Unknown'),  # Key from audio features
+        'genre': ', '.join(genres or ['Unknown']),  # Genres from artist details
+        'language': 'Unknown',  # Spotify does not directly provide language; set it to 'Unknown'
+        'album': album_name,  # Album name
+        'duration': duration,  # Duration in mm:ss format
+        'spotify_url': track['external_urls']['spotify']  # Spotify URL for the track
+    }
+
+
+def fetch_songs_features(songs, executor):
+    """
+    Song features for every (title, artist) in `songs`, through the persistent enrichment cache.
+
+    Cache misses go through three phases: one search per song (run on `executor`), then
+    batched audio-features and artists calls for the whole message, then a merge. The
+    number of Spotify round-trips beyond the searches is constant per message.
+    """
+    keys = {song: song_key(*song) for song in songs}
+    cached = dict(zip(songs, executor.map(lambda song: song_cache.get(keys[song]), songs)))
+    features = {song: value for song, (hit, value) in cached.items() if hit}
+    misses = [song for song, (hit, _) in cached.items() if not hit]
+
+    def search(song):
+        try:
+            return search_track(*song)
+        except Exception as e:
+            logging.error(f"Error searching Spotify for '{song[0]}' by '{song[1]}': {e}")
+            return False  # Failed, as opposed to None: not found
+
+    tracks = dict(zip(misses, executor.map(search, misses)))
+    for song, track in tracks.items():
+        if track is None:
+            features[song] = None
+            song_cache.set(keys[song], None)
+
+    found = {song: track for song, track in tracks.items() if track}
+    if found:
+        try:
+            audio_features = fetch_audio_features(sorted({track['id'] for track in found.values()}))
+            genres = fetch_artist_genres(sorted({track['artists'][0]['id'] for track in found.values()}))
+        except Exception as e:
+            # Failures are not cached, so the next scrape tries again
+            logging.error(f"Error fetching Spotify audio features / artists for {len(found)} tracks: {e}")
+            found = {}
+        for song, track in found.items():
+            features[song] = track_features(track, audio_features.get(track['id'], {}),
+                                            genres.get(track['artists'][0]['id']))
+            song_cache.set(keys[song], features[song])
+
+    return {song: features.get(song) or dict(UNKNOWN_SONG_FEATURES) for song in songs}
+
+
+def enrich_songs(songs):
+    """
+    Artist type and song features for every (title, artist name) in `songs`.
+
+    Returns {(title, artist): (artist_type, song_features)}. Each distinct artist and
+    each distinct song is looked up once. MusicBrainz runs on its own small pool, because
+    its 1 req/s limiter would otherwise park every worker and hold up the Spotify phases.
+    """
+    songs = list(dict.fromkeys(songs))
+
+    with ThreadPoolExecutor(max_workers=ENRICHMENT_WORKERS) as executor, \
+            ThreadPoolExecutor(max_workers=MUSICBRAINZ_WORKERS) as musicbrainz_executor:
+        artist_lookups = {name: musicbrainz_executor.submit(fetch_artist_data, name)
+                          for name in {artist for _, artist in songs}}
+        # Fetch song features from Spotify API, alongside the MusicBrainz lookups
+        features = fetch_songs_features([(title, artist) for title, artist in songs if title and artist], executor)
+
+        enriched = {}
+        for title, artist in songs:
+            artist_data = artist_lookups[artist].result()
+            # Check if artist_data is None before accessing its attributes
+            artist_type = artist_data.get('type', 'Unknown') if artist_data else 'Unknown'
+            enriched[(title, artist)] = (artist_type, features.get((title, artist), dict(UNKNOWN_SONG_FEATURES)))
+
+    return enriched
+
+
+def reset_stats():
+    for cache in (artist_cache, song_cache):
+        cache.reset_stats()
+    external_calls.reset()
+
+
+def log_stats(label):
+    """Cache hit rates and external calls since reset_stats(), then enforce the cache bounds."""
+    logging.info(f"Enrichment cache for {label}: artists {artist_cache.stats()}, songs {song_cache.stats()}")
+    logging.info(f"External API calls for {label}: {external_calls.snapshot()}")
+    for cache in (artist_cache, song_cache):
+        cache.prune()
@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import re
+import threading
+from crud.db import get_db_connection
+
+
+# Found entries are refreshed after this many seconds, "not found" entries sooner
+ENRICHMENT_CACHE_TTL = float(os.getenv("ENRICHMENT_CACHE_TTL", str(7 * 24 * 3600)))
+ENRICHMENT_CACHE_NEGATIVE_TTL = float(os.getenv("ENRICHMENT_CACHE_NEGATIVE_TTL", str(24 * 3600)))
+# Entries kept per kind; the least recently used are evicted beyond this
+ENRICHMENT_CACHE_MAX_ENTRIES = int(os.getenv("ENRICHMENT_CACHE_MAX_ENTRIES", "50000"))
+
+# Separates title and artist in song keys; cannot appear in a normalized name
+KEY_SEPARATOR = "\x1f"
+
+
+def normalize(value):
+    """Same normalization as the normalize_name() SQL function (migrations/004)."""
+    return re.sub(r"\s+", " ", value or "").strip().lower()
+
+
+def song_key(title, artist):
+    return f"{normalize(title)}{KEY_SEPARATOR}{normalize(artist)}"
+
+
+def artist_key(name):
+    return normalize(name)
+
+
+class EnrichmentCache:
+    """
+    Postgres-backed cache of one kind of external lookup (table enrichment_cache).
+
+    get() returns (hit, value); a hit with value None is a cached "not found". Failures
+    of the cache itself are logged and treated as misses, so enrichment never depends
+    on it. Hit/miss counters cover the current run (see reset_stats).
+    """
+
+    def __init__(self, kind, ttl=ENRICHMENT_CACHE_TTL, negative_ttl=ENRICHMENT_CACHE_NEGATIVE_TTL,
+                 max_entries=ENRICHMENT_CACHE_MAX_ENTRIES):
+        self.kind = kind
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.negative_hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _count(self, hit, negative=False):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.negative_hits += negative
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        connection = get_db_connection()
+        cursor = connection.cursor()
+
+        try:
+            # Refresh the LRU timestamp in the same round-trip as the read
+            cursor.execute("""
+                UPDATE enrichment_cache SET last_used_at = now()
+                WHERE kind = %s AND key = %s AND expires_at > now()
+                RETURNING value;
+            """, (self.kind, key))
+            row = cursor.fetchone()
+            connection.commit()
+
+        except Exception as e:
+            connection.rollback()
+            logging.warning(f"Enrichment cache lookup failed for {self.kind} '{key}': {e}")
+            row = None
+
+        finally:
+            cursor.close()
+            connection.close()
+
+        if row is None:
+            self._count(hit=False)
+            return False, None
+        self._count(hit=True, negative=row[0] is None)
+        return True, row[0]
+
+    def set(self, key, value):
+        """Store a lookup result; None records that the upstream had nothing for this key."""
+        ttl = self.ttl if value is not None else self.negative_ttl
+        connection = get_db_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("""
+                INSERT INTO enrichment_cache (kind, key, value, expires_at)
+                VALUES (%s, %s, %s, now() + make_interval(secs => %s))
+                ON CONFLICT (kind, key) DO UPDATE
+                SET value = EXCLUDED.value,
+                    expires_at = EXCLUDED.expires_at,
+                    last_used_at = now();
+            """, (self.kind, key, json.dumps(value) if value is not None else None, ttl))
+            connection.commit()
+
+        except Exception as e:
+            connection.rollback()
+            logging.warning(f"Enrichment cache store failed for {self.kind} '{key}': {e}")
+
+        finally:
+            cursor.close()
+            connection.close()
+
+    def prune(self):
+        """Drop expired entries, then the least recently used ones beyond max_entries."""
+        connection = get_db_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("DELETE FROM enrichment_cache WHERE kind = %s AND expires_at <= now();", (self.kind,))
+            expired = cursor.rowcount
+            cursor.execute("""
+                DELETE FROM enrichment_cache
+                WHERE kind = %s AND key IN (
+                    SELECT key FROM enrichment_cache
+                    WHERE kind = %s
+                    ORDER BY last_used_at DESC
+                    OFFSET %s
+                );
+            """, (self.kind, self.kind, self.max_entries))
+            evicted = cursor.rowcount
+            connection.commit()
+            if expired or evicted:
+                logging.info(f"Enrichment cache '{self.kind}': {expired} expired, {evicted} evicted")
+
+        except Exception as e:
+            connection.rollback()
+            logging.warning(f"Enrichment cache prune failed for {self.kind}: {e}")
+
+        finally:
+            cursor.close()
+            connection.close()
+
+
+artist_cache = EnrichmentCache("artist")
+song_cache = EnrichmentCache("song")
@@ -0,0 +1,95 @@
+"""
+Background half of the two-phase ingest: drains the enrichment_jobs work table that
+processor.handler fills, looks the songs up on MusicBrainz and Spotify, and stores key,
+genre, artist type and Spotify URL.
+
+Jobs are leased, not deleted, when claimed: a worker that dies mid-batch leaves them to
+reappear after ENRICHMENT_LEASE_SECONDS. Updates never replace known values, so a job
+that runs twice is harmless.
+
+    python -m processor.enrichment_worker [--loop] [--batch-size N]
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from crud.store import unit_of_work, claim_enrichment_jobs, update_song_enrichment, complete_enrichment_jobs
+from crud.snapshots import rebuild_snapshots
+from crud.stats import refresh_chart_stats
+from processor.enrichment import enrich_songs, reset_stats, log_stats
+
+
+# Songs claimed per batch, how long a claim lasts, and the idle wait of --loop
+ENRICHMENT_BATCH_SIZE = int(os.getenv('ENRICHMENT_BATCH_SIZE', '200'))
+ENRICHMENT_LEASE_SECONDS = int(os.getenv('ENRICHMENT_LEASE_SECONDS', '900'))
+ENRICHMENT_POLL_INTERVAL = float(os.getenv('ENRICHMENT_POLL_INTERVAL', '5'))
+# Stop claiming new batches when the Lambda has less than this left (milliseconds)
+ENRICHMENT_MIN_REMAINING_MS = 120000
+
+
+def run_once(batch_size=ENRICHMENT_BATCH_SIZE):
+    """Enrich one batch of due jobs. Returns the number of jobs processed (0: queue is empty)."""
+    jobs = claim_enrichment_jobs(batch_size, ENRICHMENT_LEASE_SECONDS)
+    if not jobs:
+        return 0
+
+    reset_stats()
+    started = time.perf_counter()
+    enriched = enrich_songs([(title, artist) for _, title, artist in jobs])
+
+    changed = []
+    # Failed lookups are not cached and leave the song incomplete, so the next scrape
+    # that charts it queues it again
+    with unit_of_work():
+        for song_id, title, artist in jobs:
+            artist_type, song_features = enriched[(title, artist)]
+            if update_song_enrichment(
+                song_id,
+                artist_type=artist_type,
+                key=str(song_features.get('key', 'Unknown')),  # Spotify returns the pitch class as an int
+                genre=song_features.get('genre', 'Unknown'),
+                language=song_features.get('language', 'Unknown'),
+                spotify_url=song_features.get('spotify_url'),
+            ):
+                changed.append(song_id)
+        dates = complete_enrichment_jobs([song_id for song_id, _, _ in jobs], changed)
+
+    logging.info(f"Enriched {len(jobs)} queued songs ({len(changed)} changed) in {time.perf_counter() - started:.1f}s")
+    log_stats(f"{len(jobs)} queued songs")
+
+    # The ingest already published these charts; republish them with the new features
+    for date in dates:
+        rebuild_snapshots(date)
+        refresh_chart_stats(date)
+
+    return len(jobs)
+
+
+def lambda_handler(event, context):
+    """Scheduled AWS Lambda handler: drain the work table while time allows."""
+    processed = 0
+    while context is None or context.get_remaining_time_in_millis() > ENRICHMENT_MIN_REMAINING_MS:
+        count = run_once()
+        if not count:
+            break
+        processed += count
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(f'Enriched {processed} songs')
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Enrich queued chart songs from MusicBrainz and Spotify.")
+    parser.add_argument("--loop", action="store_true", help="keep polling for new jobs instead of exiting once the queue is empty")
+    parser.add_argument("--batch-size", type=int, default=ENRICHMENT_BATCH_SIZE, help="songs claimed per batch")
+    args = parser.parse_args()
+
+    while True:
+        if not run_once(args.batch_size):
+            if not args.loop:
+                break
+            time.sleep(ENRICHMENT_POLL_INTERVAL)
@@ -0,0 +1,66 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every worker calling one upstream API.
+
+    acquire() blocks until a token is available: `rate` tokens are added per second, up
+    to `capacity`. A rate of 0 means no fixed limit. pause() stops all callers for a
+    while, for upstreams that tell us when to come back (HTTP 429 Retry-After).
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until:
+                    if self.rate <= 0:
+                        return
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    wait = self._paused_until - now
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+
+class CallCounter:
+    """Thread-safe count of external API calls by name, reset per message."""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._counts = {}
+
+    def snapshot(self):
+        with self._lock:
+            return {"total": sum(self._counts.values()), **dict(sorted(self._counts.items()))}
@@ -0,0 +1,77 @@
+import datetime
+import pytest
+import crud.cache
+from crud.cache import ResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(crud.cache.time, "monotonic", clock)
+    return clock
+
+
+def test_get_returns_stored_value_and_counts_hits():
+    cache = ResponseCache(2)
+    assert cache.get("a") is None
+    cache.set("a", b"body")
+    assert cache.get("a") == b"body"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResponseCache(2, ttl=60)
+    cache.set("a", 1)
+    clock.now += 60
+    assert cache.get("a") == 1
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_without_ttl_entries_never_expire(clock):
+    cache = ResponseCache(2)
+    cache.set("a", 1)
+    clock.now += 10 ** 6
+    assert cache.get("a") == 1
+
+
+def test_invalidate_drops_matching_keys_only():
+    cache = ResponseCache(4)
+    cache.set(("2024-09-13", "youtube"), 1)
+    cache.set(("2024-09-13", "billboard"), 2)
+    cache.set(("2024-09-14", "youtube"), 3)
+    cache.invalidate(lambda key: key[0] == "2024-09-13")
+    assert cache.get(("2024-09-13", "youtube")) is None
+    assert cache.get(("2024-09-13", "billboard")) is None
+    assert cache.get(("2024-09-14", "youtube")) == 3
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_invalidate_chart_date_accepts_date_objects(monkeypatch):
+    cache = ResponseCache(4)
+    monkeypatch.setattr(crud.cache, "charts_cache", cache)
+    cache.set(("2024-09-13", "youtube"), 1)
+    crud.cache.invalidate_chart_date(datetime.date(2024, 9, 13))
+    assert cache.get(("2024-09-13", "youtube")) is None
@@ -0,0 +1,137 @@
+import threading
+import time
+import psycopg2.extensions
+import pytest
+import crud.db
+from crud.db import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        self.connection.pings += 1
+        if self.connection.ping_delay:
+            time.sleep(self.connection.ping_delay)
+        if self.connection.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.ping_delay = 0
+        self.pings = 0
+        self.rollbacks = 0
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def get_transaction_status(self):
+        return self.status
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture(autouse=True)
+def fake_connect(monkeypatch):
+    opened = []
+
+    def connect():
+        connection = FakeConnection()
+        opened.append(connection)
+        return connection
+
+    monkeypatch.setattr(crud.db, "connect", connect)
+    return opened
+
+
+def test_invalid_sizes_are_rejected():
+    with pytest.raises(ValueError):
+        ConnectionPool(min_size=2, max_size=1)
+    with pytest.raises(ValueError):
+        ConnectionPool(min_size=0, max_size=0)
+
+
+def test_min_size_connections_are_opened_up_front(fake_connect):
+    pool = ConnectionPool(min_size=2, max_size=4)
+    assert len(fake_connect) == 2
+    assert pool.stats()["idle"] == 2
+
+
+def test_connections_are_reused_after_release(fake_connect):
+    pool = ConnectionPool(min_size=0, max_size=2)
+    connection = pool.acquire()
+    pool.release(connection)
+    assert pool.acquire() is connection
+    assert len(fake_connect) == 1
+
+
+def test_acquire_times_out_when_pool_is_exhausted():
+    pool = ConnectionPool(min_size=0, max_size=1, timeout=0.05)
+    pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+
+def test_release_wakes_a_waiting_caller():
+    pool = ConnectionPool(min_size=0, max_size=1, timeout=2)
+    connection = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(connection,)).start()
+    assert pool.acquire() is connection
+
+
+def test_release_rolls_back_unfinished_transactions():
+    pool = ConnectionPool(min_size=0, max_size=1)
+    connection = pool.acquire()
+    connection.status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    pool.release(connection)
+    assert connection.rollbacks == 1
+    assert pool.stats()["idle"] == 1
+
+
+def test_closed_connections_are_not_returned_to_the_pool():
+    pool = ConnectionPool(min_size=0, max_size=1)
+    connection = pool.acquire()
+    connection.close()
+    pool.release(connection)
+    stats = pool.stats()
+    assert (stats["idle"], stats["in_use"], stats["discarded"]) == (0, 0, 1)
+
+
+def test_unhealthy_idle_connections_are_replaced(fake_connect):
+    pool = ConnectionPool(min_size=1, max_size=1, healthcheck_after=0)
+    stale = fake_connect[0]
+    stale.broken = True
+    connection = pool.acquire()
+    assert connection is not stale
+    assert stale.closed
+    assert pool.stats()["discarded"] == 1
+
+
+def test_health_check_does_not_block_other_callers(fake_connect):
+    pool = ConnectionPool(min_size=2, max_size=2, healthcheck_after=0)
+    fake_connect[1].ping_delay = 0.5  # The connection acquire() pops first
+
+    slow = threading.Thread(target=pool.acquire)
+    slow.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    pool.stats()
+    assert pool.acquire() is fake_connect[0]
+    assert time.monotonic() - started < 0.25
+    slow.join()
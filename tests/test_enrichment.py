@@ -0,0 +1,60 @@
+import pytest
+
+spotipy = pytest.importorskip("spotipy")
+import processor.enrichment as enrichment  # noqa: E402
+
+
+class RecordingLimiter:
+    def __init__(self):
+        self.acquired = 0
+        self.pauses = []
+
+    def acquire(self):
+        self.acquired += 1
+
+    def pause(self, seconds):
+        self.pauses.append(seconds)
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = RecordingLimiter()
+    monkeypatch.setattr(enrichment, "spotify_limiter", limiter)
+    return limiter
+
+
+def scripted(responses):
+    """Fake Spotify client method returning or raising each of `responses` in turn."""
+    def search(**kwargs):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+    return search
+
+
+def test_client_leaves_429_to_spotify_call():
+    assert 429 not in enrichment.sp.status_forcelist
+
+
+def test_429_pauses_the_shared_limiter_for_retry_after(limiter):
+    too_many = spotipy.exceptions.SpotifyException(429, -1, "rate limited", headers={"Retry-After": "7"})
+    method = scripted([too_many, {"tracks": {"items": []}}])
+
+    assert enrichment.spotify_call(method, q="track:x") == {"tracks": {"items": []}}
+    assert limiter.pauses == [7]
+    assert limiter.acquired == 2
+
+
+def test_other_errors_are_raised_without_pausing(limiter):
+    not_found = spotipy.exceptions.SpotifyException(404, -1, "not found", headers={})
+    with pytest.raises(spotipy.exceptions.SpotifyException):
+        enrichment.spotify_call(scripted([not_found]))
+    assert limiter.pauses == []
+
+
+def test_gives_up_after_max_retries(limiter):
+    too_many = spotipy.exceptions.SpotifyException(429, -1, "rate limited", headers={"Retry-After": "1"})
+    with pytest.raises(RuntimeError):
+        enrichment.spotify_call(scripted([too_many] * 3), max_retries=3)
+    assert limiter.pauses == [1, 1, 1]
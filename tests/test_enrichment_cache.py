@@ -0,0 +1,49 @@
+import pytest
+import processor.enrichment_cache
+from processor.enrichment_cache import EnrichmentCache, KEY_SEPARATOR, artist_key, normalize, song_key
+
+
+# Expected values follow normalize_name() in migrations/004_artist_song_identity.sql:
+# lower(btrim(regexp_replace(value, '\s+', ' ', 'g')))
+@pytest.mark.parametrize("value, expected", [
+    ("Bad Bunny", "bad bunny"),
+    ("  Bad   Bunny  ", "bad bunny"),
+    ("Bad\tBunny\n", "bad bunny"),
+    ("BEYONCÉ", "beyoncé"),
+    ("", ""),
+    (None, ""),
+])
+def test_normalize_matches_the_sql_function(value, expected):
+    assert normalize(value) == expected
+
+
+def test_keys_ignore_case_and_spacing():
+    assert artist_key(" Taylor  Swift") == artist_key("taylor swift")
+    assert song_key("Anti-Hero ", "Taylor Swift") == song_key("anti-hero", "TAYLOR SWIFT")
+
+
+def test_song_key_keeps_title_and_artist_apart():
+    assert song_key("a b", "c") != song_key("a", "b c")
+    assert song_key("a", "b").split(KEY_SEPARATOR) == ["a", "b"]
+
+
+class BrokenConnection:
+    def cursor(self):
+        return self
+
+    def execute(self, *args):
+        raise RuntimeError("relation \"enrichment_cache\" does not exist")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_cache_failures_are_misses(monkeypatch):
+    monkeypatch.setattr(processor.enrichment_cache, "get_db_connection", BrokenConnection)
+    cache = EnrichmentCache("artist")
+    assert cache.get("bad bunny") == (False, None)
+    cache.set("bad bunny", {"type": "Person"})  # Logged, not raised
+    assert cache.stats() == {"hits": 0, "negative_hits": 0, "misses": 1, "hit_rate": 0.0}
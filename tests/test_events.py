@@ -0,0 +1,27 @@
+from crud.cache import available_dates_cache, charts_cache
+from crud.events import ChartEventBroker
+
+EVENT = {"date": "2024-09-13", "source": "youtube", "version": 2, "countries": ["US"]}
+
+
+def test_publish_drops_cached_charts_and_available_dates():
+    charts_cache.set(("2024-09-13", "youtube"), b"old")
+    charts_cache.set(("2024-09-12", "youtube"), b"kept")
+    available_dates_cache.set("all", b"old")
+
+    ChartEventBroker().publish(EVENT)
+
+    assert charts_cache.get(("2024-09-13", "youtube")) is None
+    assert charts_cache.get(("2024-09-12", "youtube")) == b"kept"
+    assert available_dates_cache.get("all") is None
+
+
+def test_slow_subscribers_lose_the_oldest_events():
+    broker = ChartEventBroker(queue_size=2)
+    queue = broker.subscribe()
+
+    for version in range(3):
+        broker.publish({**EVENT, "version": version})
+
+    assert [queue.get_nowait()["version"] for _ in range(2)] == [1, 2]
+    assert broker.dropped == 1
@@ -0,0 +1,123 @@
+import datetime
+import pytest
+from fastapi.testclient import TestClient
+import crud.handler
+from crud.handler import app
+
+client = TestClient(app)
+
+CHART_DATES = [(datetime.date(2024, 9, 13),), (datetime.date(2024, 9, 14),)]
+
+
+class FakeConnection:
+    """Answers each execute() with the next scripted result set."""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.rows = []
+        self.committed = False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        self.rows = self.results.pop(0)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def republished(monkeypatch):
+    calls = []
+    monkeypatch.setattr(crud.handler, "_republish_chart_dates", calls.append)
+    return calls
+
+
+def test_update_artist_republishes_its_chart_dates(monkeypatch, republished):
+    connection = FakeConnection([[(7, "Edited", "Person")], CHART_DATES])
+    monkeypatch.setattr(crud.handler, "get_db_connection", lambda: connection)
+
+    response = client.put("/artists/7", json={"name": "Edited", "type": "Person"})
+
+    assert response.status_code == 200
+    assert connection.committed
+    assert republished == [[date for date, in CHART_DATES]]
+
+
+def test_update_song_republishes_its_chart_dates(monkeypatch, republished):
+    song = (1, "Edited A", 7, None, None, None, None, None, None)
+    connection = FakeConnection([[song], CHART_DATES])
+    monkeypatch.setattr(crud.handler, "get_db_connection", lambda: connection)
+
+    response = client.put("/songs/1", json={"title": "Edited A", "artist_id": 7})
+
+    assert response.status_code == 200
+    assert response.json()["title"] == "Edited A"
+    assert republished == [[date for date, in CHART_DATES]]
+
+
+def test_missing_song_is_not_republished(monkeypatch, republished):
+    connection = FakeConnection([[], []])
+    monkeypatch.setattr(crud.handler, "get_db_connection", lambda: connection)
+
+    response = client.put("/songs/404", json={"title": "Nope", "artist_id": 7})
+
+    assert response.status_code == 404
+    assert republished == []
+
+
+def test_republish_failures_are_logged_not_raised(monkeypatch):
+    rebuilt = []
+
+    def rebuild_snapshots(date):
+        rebuilt.append(date)
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(crud.handler, "rebuild_snapshots", rebuild_snapshots)
+    monkeypatch.setattr(crud.handler, "refresh_chart_stats", lambda date: None)
+    crud.handler._republish_chart_dates(["2024-09-13", "2024-09-14"])
+    assert rebuilt == ["2024-09-13", "2024-09-14"]
+
+
+def test_bulk_ingest_republishes_its_date_after_responding(monkeypatch, republished):
+    monkeypatch.setattr(crud.handler, "add_charts_bulk", lambda chart_data: {"date": chart_data.date})
+
+    response = client.post("/charts/bulk", json={"date": "2024-09-13", "charts": {}})
+
+    assert response.status_code == 200
+    assert republished == [["2024-09-13"]]
+
+
+@pytest.mark.parametrize("existed, expected", [(True, [["2024-09-13"]]), (False, [])])
+def test_create_song_republishes_an_updated_song(monkeypatch, republished, existed, expected):
+    monkeypatch.setattr(crud.handler, "upsert_song", lambda **song: (1, existed))
+    monkeypatch.setattr(crud.handler, "charted_dates", lambda song_id: ["2024-09-13"])
+
+    response = client.post("/songs", json={"title": "Song A", "artist_id": 7, "genre": "pop"})
+
+    assert response.json() == 1
+    assert republished == expected
+
+
+@pytest.mark.parametrize("existed, expected", [(True, [["2024-09-13"]]), (False, [])])
+def test_create_artist_republishes_an_updated_artist(monkeypatch, republished, existed, expected):
+    monkeypatch.setattr(crud.handler, "upsert_artist", lambda artist: (7, existed))
+    monkeypatch.setattr(crud.handler, "charted_dates", lambda artist_id: ["2024-09-13"])
+
+    response = client.post("/artists", json={"name": "Artist A", "type": "Person"})
+
+    assert response.json() == 7
+    assert republished == expected
@@ -0,0 +1,33 @@
+from fastapi.testclient import TestClient
+from crud.handler import app
+
+# Not entered as a context manager: startup (database, LISTEN connection) never runs,
+# which is fine for requests rejected before any query
+client = TestClient(app)
+
+
+def test_charts_range_rejects_nonexistent_dates():
+    response = client.get("/charts/range", params={"from": "2024-02-30", "to": "2024-03-01"})
+    assert response.status_code == 400
+    assert "2024-02-30" in response.json()["detail"]
+
+
+def test_charts_range_rejects_reversed_range():
+    response = client.get("/charts/range", params={"from": "2024-03-02", "to": "2024-03-01"})
+    assert response.status_code == 400
+
+
+def test_song_history_rejects_nonexistent_dates():
+    for params in ({"from": "2024-02-30"}, {"to": "2024-02-30"}, {"from": "2024-02-01", "to": "2024-02-30"}):
+        response = client.get("/songs/1/history", params=params)
+        assert response.status_code == 400
+
+
+def test_stats_rejects_nonexistent_dates():
+    response = client.get("/stats", params={"from": "2024-02-30"})
+    assert response.status_code == 400
+
+
+def test_stats_rejects_unknown_dimensions():
+    response = client.get("/stats", params={"from": "2024-03-01", "dimension": "mood"})
+    assert response.status_code == 400
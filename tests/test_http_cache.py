@@ -0,0 +1,62 @@
+import gzip
+import pytest
+from starlette.requests import Request
+import crud.http_cache
+from crud.http_cache import EncodedBody, conditional_response, etag_matches, negotiate_encoding
+
+LARGE_BODY = b'{"charts": {}}' + b" " * 2048
+
+
+def make_request(**headers):
+    return Request({
+        "type": "http",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def test_small_bodies_are_not_compressed():
+    assert negotiate_encoding(make_request(accept_encoding="gzip, br"), b"{}") is None
+
+
+def test_brotli_is_preferred_when_accepted():
+    assert negotiate_encoding(make_request(accept_encoding="gzip, br"), LARGE_BODY) == "br"
+
+
+def test_gzip_is_used_without_brotli(monkeypatch):
+    monkeypatch.setattr(crud.http_cache, "brotli", None)
+    assert negotiate_encoding(make_request(accept_encoding="gzip, br"), LARGE_BODY) == "gzip"
+
+
+def test_refused_and_missing_encodings():
+    assert negotiate_encoding(make_request(accept_encoding="br;q=0, gzip"), LARGE_BODY) == "gzip"
+    assert negotiate_encoding(make_request(), LARGE_BODY) is None
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc"', True),
+    ('"abc-gz"', True),
+    ('"abc-br"', True),
+    ('"other", "abc"', True),
+    ("*", True),
+    ('"other"', False),
+])
+def test_etag_matches_any_encoding_variant(header, expected):
+    assert etag_matches(make_request(if_none_match=header), "abc") is expected
+
+
+def test_etag_matches_without_header():
+    assert etag_matches(make_request(), "abc") is False
+
+
+def test_conditional_response_compresses_and_revalidates():
+    encoded = EncodedBody(LARGE_BODY)
+    response = conditional_response(make_request(accept_encoding="gzip"), encoded)
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == LARGE_BODY
+
+    etag = response.headers["etag"]
+    assert etag == f'"{encoded.etag}-gz"'
+    revalidated = conditional_response(make_request(accept_encoding="gzip", if_none_match=etag), encoded)
+    assert revalidated.status_code == 304
+    assert revalidated.body == b""
@@ -0,0 +1,92 @@
+import threading
+import pytest
+import processor.rate_limit
+from processor.rate_limit import CallCounter, TokenBucket
+
+
+class Clock:
+    """Fake monotonic clock; sleeping advances it instead of blocking."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(processor.rate_limit.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(processor.rate_limit.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_calls_are_spaced_by_the_rate(clock):
+    bucket = TokenBucket(rate=2)
+    started = clock.now
+    for _ in range(5):
+        bucket.acquire()
+    # The first token is available up front, the next four arrive every 0.5s
+    assert clock.now - started == pytest.approx(2.0)
+
+
+def test_capacity_allows_a_burst(clock):
+    bucket = TokenBucket(rate=1, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.slept == []
+    bucket.acquire()
+    assert sum(clock.slept) == pytest.approx(1.0)
+
+
+def test_idle_time_does_not_exceed_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=2)
+    clock.now += 60
+    for _ in range(3):
+        bucket.acquire()
+    assert sum(clock.slept) == pytest.approx(1.0)
+
+
+def test_zero_rate_is_unlimited(clock):
+    bucket = TokenBucket(rate=0)
+    for _ in range(100):
+        bucket.acquire()
+    assert clock.slept == []
+
+
+def test_pause_blocks_every_caller_until_it_ends(clock):
+    bucket = TokenBucket(rate=0)
+    bucket.pause(30)
+    started = clock.now
+    bucket.acquire()
+    assert clock.now - started == pytest.approx(30)
+
+
+def test_pause_drains_the_bucket(clock):
+    bucket = TokenBucket(rate=1, capacity=5)
+    bucket.pause(2)
+    started = clock.now
+    for _ in range(3):
+        bucket.acquire()
+    # The burst allowance is gone: only the two tokens earned during the pause remain
+    assert clock.now - started == pytest.approx(3)
+
+
+def test_call_counter_counts_per_name_across_threads():
+    counter = CallCounter()
+    threads = [threading.Thread(target=lambda: [counter.inc("spotify.search") for _ in range(100)])
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc("musicbrainz")
+    assert counter.snapshot() == {"total": 401, "musicbrainz": 1, "spotify.search": 400}
+    counter.reset()
+    assert counter.snapshot() == {"total": 0}